@@ -1,14 +1,92 @@
-import json
+import asyncio
+import time
 import uuid
-from typing import Callable
+import weakref
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
 
 import aio_pika
 import inject
-import asyncio
 
 from app.core.config import settings
 from app.services.loggers import AuditLogger
 from app.utils import validate_message_schema
+from app.utils.messaging import (
+    ASYNC,
+    PERMANENT,
+    THROTTLED,
+    TRANSIENT,
+    AMQPConnector,
+    BackpressureController,
+    CallbackOffloader,
+    CircuitBreaker,
+    CodecRegistry,
+    Deduplicator,
+    ErrorClassifier,
+    EventRouter,
+    HandlerPool,
+    InvalidMessageError,
+    KeyedExecutor,
+    MemoryMembership,
+    MemoryOffsetStore,
+    MessageBatcher,
+    MessageEnvelope,
+    QueueDepth,
+    QueueDepthMonitor,
+    QueueSpec,
+    RetryPolicy,
+    RetryTiers,
+    SchemaRegistry,
+    ShardCoordinator,
+    StreamOffsetTracker,
+    TrafficRecorder,
+    default_codecs,
+    event_router,
+    partition_key,
+)
+from app.utils.messaging.ordering import PARTITION_KEY
+from app.utils.messaging.sharding import SHARD_WEIGHT, Membership, shard_queue_names
+from app.utils.messaging.streams import OffsetStore, StreamOffset
+from app.utils.publisher import EventPublisher
+
+DEAD_LETTERED_AT_HEADER = "x-dead-lettered-at"
+DEFAULT_DRAIN_TIMEOUT = 30.0
+
+# basic.qos applies to consumers started after it on the same channel, so
+# each consumer's qos and consume must not interleave with another's.
+_qos_locks: "weakref.WeakKeyDictionary[aio_pika.abc.AbstractChannel, asyncio.Lock]" = \
+    weakref.WeakKeyDictionary()
+
+
+class _Consumer:
+    """
+    A running consumer on a queue, kept so it can be paused and restarted.
+    """
+
+    def __init__(self, queue: aio_pika.abc.AbstractQueue, channel: aio_pika.abc.AbstractChannel,
+                 on_message: Callable, prefetch_count: int, arguments: Optional[dict] = None):
+        self.queue = queue
+        self.arguments = arguments
+        self.channel = channel
+        self.on_message = on_message
+        self.prefetch_count = prefetch_count
+        self.consumer_tag: Optional[str] = None
+        self.paused = False
+
+    async def start(self):
+        lock = _qos_locks.setdefault(self.channel, asyncio.Lock())
+        async with lock:
+            await self.channel.set_qos(prefetch_count=self.prefetch_count)
+            self.consumer_tag = await self.queue.consume(
+                self.on_message, no_ack=False, arguments=self.arguments
+            )
+        self.paused = False
+
+    async def stop(self):
+        if self.consumer_tag is not None:
+            await self.queue.cancel(self.consumer_tag)
+            self.consumer_tag = None
+        self.paused = True
 
 
 class EventSubscriber:
@@ -16,22 +94,102 @@ class EventSubscriber:
     A subscriber class for handling RabbitMQ messages.
     """
 
-    @inject.autoparams("audit_logger")
+    @inject.autoparams("audit_logger", "connector")
     def __init__(
-        self, exchange_name: str, dead_letter_exchange: str, audit_logger: AuditLogger
+        self,
+        exchange_name: str,
+        dead_letter_exchange: str,
+        audit_logger: AuditLogger,
+        connector: AMQPConnector,
+        prefetch_count: int = 10,
+        max_concurrency: Optional[int] = None,
+        codecs: Optional[CodecRegistry] = None,
+        schemas: Optional[SchemaRegistry] = None,
+        dedup: Optional[Deduplicator] = None,
+        backpressure: Optional[BackpressureController] = None,
+        drain_timeout: float = DEFAULT_DRAIN_TIMEOUT,
+        classifier: Optional[ErrorClassifier] = None,
+        offloader: Optional[CallbackOffloader] = None,
+        capture_path: Optional[str] = None,
+        depth_monitor: Optional[QueueDepthMonitor] = None,
+        queue_spec: Optional[QueueSpec] = None,
     ):
         """
         Initializes the instance with connection settings.
+
+        `prefetch_count` caps unacknowledged deliveries per consumer and
+        `max_concurrency` caps callbacks running at once per queue
+        (defaults to the prefetch count). `codecs` selects the body decoder
+        from each message's content type and `schemas` holds the compiled
+        validators (defaults to `validate_message_schema` for every event).
+        `dedup` skips messages whose `request_id` header was already processed
+        on the same queue.
+        `backpressure` adapts each queue's prefetch, and pauses it, from the
+        observed callback latency and backlog. `drain_timeout` bounds how
+        long `close` waits for in-flight work. `classifier` sorts failures
+        into permanent, transient and throttled, each with its own retry
+        policy in `retry_policies`. `offloader` runs "thread" and "process"
+        kind callbacks outside the event loop. `capture_path` records every
+        delivery to a JSONL file for offline replay. `depth_monitor` samples
+        each queue's broker-side depth into backlog, arrival rate and drain
+        time metrics, and can resize its handler pool within bounds; with
+        backpressure as well, the prefetch is kept within the pool size.
+        `queue_spec` is the default shape of subscription queues; without it
+        they are classic queues limited by `message_ttl` and
+        `max_message_count`, dropping the oldest message when full.
         """
         self.connection_url = settings.rabbitmq_url.unicode_string()
         self.exchange_name = exchange_name
         self.connection = None
         self.channel = None
+        self.connector = connector
+        self.publisher = EventPublisher(
+            exchange_name, audit_logger=audit_logger, connector=connector
+        )
         self.dead_letter_exchange = dead_letter_exchange
         self.retry_exchange = "retry_exchange"
+        self.dead_letter_queue = "dead_letter_queue"
         self.max_retries = 5
+        self.classifier = classifier or ErrorClassifier()
+        self.retry_policies: Dict[str, RetryPolicy] = {
+            PERMANENT: RetryPolicy(),
+            TRANSIENT: RetryPolicy(
+                self.max_retries,
+                RetryTiers.exponential(self.max_retries),
+            ),
+            THROTTLED: RetryPolicy(
+                self.max_retries,
+                RetryTiers.exponential(self.max_retries, base_ms=15000),
+            ),
+        }
         self.message_ttl = 300000
         self.max_message_count = 1000
+        self.queue_spec = queue_spec
+        self.queue_specs: Dict[str, QueueSpec] = {}
+        self.prefetch_count = prefetch_count
+        self.max_concurrency = max_concurrency or prefetch_count
+        self.codecs = codecs or default_codecs()
+        self.schemas = schemas or SchemaRegistry(fallback=validate_message_schema)
+        self.dedup = dedup
+        self.offloader = offloader or CallbackOffloader()
+        self.recorder = TrafficRecorder(capture_path) if capture_path else None
+        self.pools: Dict[str, HandlerPool] = {}
+        self.batchers: Dict[str, MessageBatcher] = {}
+        self.executors: Dict[str, KeyedExecutor] = {}
+        self.consumers: Dict[str, _Consumer] = {}
+        self.stream_offsets: Dict[str, StreamOffsetTracker] = {}
+        self.shard_coordinators: Dict[str, ShardCoordinator] = {}
+        self._shard_tasks: List[asyncio.Task] = []
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._breaker_paused: set = set()
+        self._breaker_tasks: set = set()
+        self.backpressure = backpressure
+        self._backpressure_task: Optional[asyncio.Task] = None
+        self.depth_monitor = depth_monitor
+        self.queue_depths: Dict[str, QueueDepth] = {}
+        self._depth_task: Optional[asyncio.Task] = None
+        self._depth_channel: Optional[aio_pika.abc.AbstractChannel] = None
+        self.drain_timeout = drain_timeout
         self.logger = audit_logger
 
     async def connect(self):
@@ -39,8 +197,9 @@ class EventSubscriber:
         Establishes a connection and sets up exchanges and queues.
         """
         try:
-            self.connection = await aio_pika.connect_robust(self.connection_url)
+            self.connection = await self.connector.connect(self.connection_url)
             self.channel = await self.connection.channel()
+            await self.channel.set_qos(prefetch_count=self.prefetch_count)
 
             await self.channel.declare_exchange(self.exchange_name, type="fanout")
             await self.channel.declare_exchange(
@@ -49,105 +208,892 @@ class EventSubscriber:
             await self.channel.declare_exchange(self.retry_exchange, type="direct")
 
             await self.__declare_dead_letter_queue()
+            await self.publisher.connect(self.connection)
+            if self.dedup is not None:
+                await self.dedup.connect()
 
         except aio_pika.AMQPConnectionError as e:
             self.logger.error(f"Error while connecting to RabbitMQ: {e}")
             raise
 
+    async def _declare_retry_queues(self, channel: aio_pika.abc.AbstractChannel, origin_queue: str):
+        """
+        Declare the delay queues of every retry policy for a subscribed queue.
+        Messages wait out the tier's TTL and are dead-lettered back to
+        `origin_queue` only, not to every queue bound to the exchange.
+        """
+        declared = set()
+        for policy in self.retry_policies.values():
+            if policy.tiers is None:
+                continue
+            for delay in policy.tiers.delays:
+                queue_name = policy.tiers.queue_name(origin_queue, delay)
+                if queue_name in declared:
+                    continue
+                queue = await channel.declare_queue(
+                    queue_name,
+                    durable=True,
+                    arguments=policy.tiers.queue_arguments(delay, origin_queue),
+                )
+                await queue.bind(exchange=self.retry_exchange, routing_key=queue_name)
+                declared.add(queue_name)
+
     async def __declare_dead_letter_queue(self):
         """
         Declare the dead letter queue for failed messages.
         """
         queue = await self.channel.declare_queue(
-            "dead_letter_queue",
+            self.dead_letter_queue,
             durable=True,
             arguments={"x-message-ttl": self.message_ttl},
         )
         await queue.bind(exchange=self.dead_letter_exchange)
 
-    async def subscribe_events(self, queue_name: str, callback: Callable):
+    async def subscribe_events(self, queue_name: str, callback: Callable, kind: str = ASYNC,
+                               lazy: bool = False, breaker: Optional[CircuitBreaker] = None,
+                               queue_spec: Optional[QueueSpec] = None):
         """
         Subscribes to events on a specified queue and processes them using a callback.
+
+        `kind` is "async" for coroutine callbacks run on the event loop, or
+        "thread"/"process" for synchronous callbacks run in the offloader's
+        pools while acking stays on the loop. With `lazy`, the callback gets a
+        MessageEnvelope whose body is decoded and validated only when its
+        `data` is first read (not picklable, so not for "process" kind).
+
+        A `breaker` stops calling the callback while its non-permanent
+        failure rate is too high: deliveries are deferred to the delay queues,
+        or the queue is paused, until half-open probes succeed again.
+        `queue_spec` overrides the subscriber's default queue shape.
+        """
+        try:
+            queue = await self._declare_queue(self.channel, queue_name, spec=queue_spec)
+
+            pool = HandlerPool(queue_name, self.max_concurrency)
+            self.pools[queue_name] = pool
+            self._register_breaker(queue_name, breaker)
+            await self._start_consumer(
+                queue_name, queue,
+                await self._consume_message(self.offloader.wrap(callback, kind), pool, lazy, breaker),
+            )
+
+        except aio_pika.AMQPError as e:
+            self.logger.error(f"Error while subscribing to queue {queue_name}: {e}")
+            raise
+
+    async def subscribe_ordered(
+        self,
+        queue_name: str,
+        callback: Callable,
+        lanes: Optional[int] = None,
+        key: Optional[Callable[[aio_pika.IncomingMessage], Optional[str]]] = None,
+        kind: str = ASYNC,
+        lazy: bool = False,
+        breaker: Optional[CircuitBreaker] = None,
+        queue_spec: Optional[QueueSpec] = None,
+    ):
+        """
+        Subscribes to a queue, processing messages with the same partition key
+        (by default `auction_id` from the headers or body) strictly in delivery
+        order, while different keys run in parallel across `lanes` workers
+        (defaults to `max_concurrency`).
+
+        A message that fails is retried through the delay queues and so loses
+        its place relative to later messages for the same key. `kind`, `lazy`,
+        `breaker` and `queue_spec` work as in `subscribe_events`.
+        """
+        try:
+            queue = await self._declare_queue(self.channel, queue_name, spec=queue_spec)
+
+            pool = HandlerPool(queue_name, self.max_concurrency)
+            executor = KeyedExecutor(lanes or self.max_concurrency)
+            self.pools[queue_name] = pool
+            self.executors[queue_name] = executor
+            self._register_breaker(queue_name, breaker)
+            handler = await self._consume_message(
+                self.offloader.wrap(callback, kind), pool, lazy, breaker
+            )
+            key = key or (lambda message: partition_key(message, self.codecs))
+
+            async def on_message(message: aio_pika.IncomingMessage):
+                await executor.submit(key(message), lambda: handler(message))
+
+            await self._start_consumer(queue_name, queue, on_message)
+
+        except aio_pika.AMQPError as e:
+            self.logger.error(f"Error while subscribing to queue {queue_name}: {e}")
+            raise
+
+    async def subscribe_router(self, queue_name: str, router: EventRouter, lazy: bool = False,
+                               queue_spec: Optional[QueueSpec] = None):
+        """
+        Subscribes each of the router's routes to a queue of its own,
+        `<queue_name>.<event_type>`, fed by a headers exchange that matches
+        the event type header. Each queue's prefetch and pool size are its
+        route's concurrency, so a slow event type backs up only its own
+        queue instead of holding deliveries that fast types are waiting on.
+
+        Messages no route matches go to the dead-letter exchange (the routing
+        exchange's alternate exchange) without their body being decoded.
+        Routes must be registered before subscribing. `lazy` and `queue_spec`
+        work as in `subscribe_events`.
+        """
+        try:
+            routed_exchange = f"{self.exchange_name}.{queue_name}.routed"
+            exchange = await self.channel.declare_exchange(
+                routed_exchange, type="headers",
+                arguments={"alternate-exchange": self.dead_letter_exchange},
+            )
+            await exchange.bind(self.exchange_name)
+
+            for route in router.routes.values():
+                route_queue = f"{queue_name}.{route.event_type}"
+                queue = await self._declare_queue(
+                    self.channel, route_queue, exchange=routed_exchange, spec=queue_spec,
+                    bind_arguments={"x-match": "all", router.header: route.event_type},
+                )
+                pool = HandlerPool(route_queue, route.pool.size)
+                self.pools[route_queue] = pool
+                await self._start_consumer(
+                    route_queue, queue, await self._consume_message(route, pool, lazy),
+                    prefetch_count=route.pool.size,
+                )
+
+        except aio_pika.AMQPError as e:
+            self.logger.error(f"Error while subscribing to queue {queue_name}: {e}")
+            raise
+
+    async def subscribe_batch(
+        self,
+        queue_name: str,
+        callback: Callable[[List[dict], List[str]], Awaitable[Optional[Iterable[int]]]],
+        batch_size: int = 100,
+        batch_timeout: float = 1.0,
+        kind: str = ASYNC,
+        queue_spec: Optional[QueueSpec] = None,
+    ):
+        """
+        Subscribes to a queue in batch mode. Deliveries are collected until
+        `batch_size` messages or `batch_timeout` seconds, then passed to
+        `callback(messages, request_ids)` as decoded lists.
+
+        The callback may return the indexes of items that failed; only those
+        go through the retry/dead-letter path. Raising fails the whole batch.
+        Each batch is then acknowledged with a single `multiple=True` ack, so
+        batch subscriptions get a channel of their own. `kind` and
+        `queue_spec` work as in `subscribe_events`.
         """
         try:
-            queue = await self.channel.declare_queue(
+            channel = await self.connection.channel()
+            channel_prefetch = max(batch_size, self.prefetch_count)
+            queue = await self._declare_queue(channel, queue_name, spec=queue_spec)
+
+            batcher = MessageBatcher(
+                batch_size, batch_timeout, self._consume_batch(self.offloader.wrap(callback, kind), queue_name)
+            )
+            self.batchers[queue_name] = batcher
+            consumer = _Consumer(queue, channel, batcher.add, channel_prefetch)
+            await consumer.start()
+            self.consumers[queue_name] = consumer
+
+        except aio_pika.AMQPError as e:
+            self.logger.error(f"Error while subscribing to queue {queue_name} in batch mode: {e}")
+            raise
+
+    async def subscribe_stream(
+        self,
+        queue_name: str,
+        callback: Callable,
+        offset: StreamOffset = "next",
+        offset_store: Optional[OffsetStore] = None,
+        consumer_name: Optional[str] = None,
+        prefetch_count: int = 1000,
+        max_age: str = "7D",
+        max_length_bytes: int = 20_000_000_000,
+        commit_every: int = 100,
+        kind: str = ASYNC,
+    ):
+        """
+        Subscribes to a RabbitMQ stream queue bound to the exchange, so the
+        event history is kept on disk (bounded by `max_age` and
+        `max_length_bytes`) rather than in a classic queue.
+
+        `offset` is "first", "last", "next", a numeric offset, a datetime, or
+        "stored" to resume after the offset last committed to `offset_store`
+        under `consumer_name`. Messages are processed one at a time in stream
+        order; failures are dead-lettered rather than retried, since
+        republishing would append them to the stream again. `kind` works as
+        in `subscribe_events`.
+        """
+        try:
+            channel = await self.connection.channel()
+            queue = await channel.declare_queue(
                 queue_name,
                 durable=True,
                 auto_delete=False,
                 arguments={
-                    "x-message-ttl": self.message_ttl,
-                    "x-dead-letter-exchange": self.dead_letter_exchange,
-                    "x-max-length": self.max_message_count,
+                    "x-queue-type": "stream",
+                    "x-max-age": max_age,
+                    "x-max-length-bytes": max_length_bytes,
                 },
             )
             await queue.bind(exchange=self.exchange_name)
-            await queue.consume(self._consume_message(callback), no_ack=False)
+
+            tracker = StreamOffsetTracker(
+                consumer_name or queue_name, offset_store or MemoryOffsetStore(), commit_every
+            )
+            await tracker.store.connect()
+            start_offset = await tracker.start_offset(offset)
+            self.stream_offsets[queue_name] = tracker
+
+            pool = HandlerPool(queue_name, 1)
+            executor = KeyedExecutor(1)
+            self.pools[queue_name] = pool
+            self.executors[queue_name] = executor
+            handler = await self._consume_stream(
+                self.offloader.wrap(callback, kind), pool, tracker
+            )
+
+            async def on_message(message: aio_pika.IncomingMessage):
+                await executor.submit(None, lambda: handler(message))
+
+            consumer = _Consumer(
+                queue, channel, on_message, prefetch_count,
+                arguments={"x-stream-offset": start_offset},
+            )
+            await consumer.start()
+            self.consumers[queue_name] = consumer
+            self.logger.log(f"Consuming stream {queue_name} from offset {start_offset}")
 
         except aio_pika.AMQPError as e:
-            self.logger.error(f"Error while subscribing to queue {queue_name}: {e}")
+            self.logger.error(f"Error while subscribing to stream {queue_name}: {e}")
             raise
 
-    async def _consume_message(self, callback):
+    async def subscribe_sharded(
+        self,
+        queue_name: str,
+        callback: Callable,
+        shards: int = 8,
+        membership: Optional[Membership] = None,
+        member_id: Optional[str] = None,
+        hash_header: str = PARTITION_KEY,
+        rebalance_interval: float = 5.0,
+        kind: str = ASYNC,
+        lazy: bool = False,
+        breaker: Optional[CircuitBreaker] = None,
+        queue_spec: Optional[QueueSpec] = None,
+    ):
+        """
+        Subscribes to `queue_name` split into `shards` queues behind a
+        consistent-hash exchange that hashes the `hash_header` header (the
+        auction id by default), so throughput scales past a single queue.
+        Messages published without the header all land on one shard.
+
+        Instances subscribing to the same `queue_name` with a shared
+        `membership` (a RedisMembership across processes) divide the shards
+        between them and rebalance every `rebalance_interval` seconds as
+        instances join or leave. Shard queues have a single active consumer
+        and each shard is processed as in `subscribe_ordered`, so one
+        auction's messages stay in order; only while a shard changes hands
+        can the new owner start before the old one finishes its in-flight
+        deliveries. `kind`, `lazy`, `breaker` (shared by all shards) and
+        `queue_spec` (applied to every shard) work as in `subscribe_events`.
+        """
+        try:
+            sharded_exchange = f"{self.exchange_name}.{queue_name}.sharded"
+            exchange = await self.channel.declare_exchange(
+                sharded_exchange, type="x-consistent-hash", arguments={"hash-header": hash_header}
+            )
+            await exchange.bind(self.exchange_name)
+            queues = {}
+            for shard in shard_queue_names(queue_name, shards):
+                queues[shard] = await self._declare_queue(
+                    self.channel, shard, exchange=sharded_exchange, routing_key=SHARD_WEIGHT,
+                    spec=queue_spec, arguments={"x-single-active-consumer": True},
+                )
+
+            coordinator = ShardCoordinator(
+                queue_name, list(queues), membership or MemoryMembership(), member_id,
+                rebalance_interval,
+            )
+            await coordinator.membership.connect()
+            self.shard_coordinators[queue_name] = coordinator
+            self._register_breaker(queue_name, breaker)
+            callback = self.offloader.wrap(callback, kind)
+
+            async def start_shard(shard: str):
+                pool = self.pools.setdefault(shard, HandlerPool(shard, self.max_concurrency))
+                executor = self.executors.setdefault(shard, KeyedExecutor(self.max_concurrency))
+                handler = await self._consume_message(callback, pool, lazy, breaker)
+
+                async def on_message(message: aio_pika.IncomingMessage):
+                    await executor.submit(
+                        partition_key(message, self.codecs, hash_header), lambda: handler(message)
+                    )
+
+                await self._start_consumer(shard, queues[shard], on_message)
+
+            await self._rebalance_shards(coordinator, start_shard)
+            self._shard_tasks.append(
+                asyncio.create_task(self._monitor_shards(coordinator, start_shard))
+            )
+
+        except aio_pika.AMQPError as e:
+            self.logger.error(f"Error while subscribing to sharded queue {queue_name}: {e}")
+            raise
+
+    async def _monitor_shards(self, coordinator: ShardCoordinator, start_shard: Callable):
+        while True:
+            await asyncio.sleep(coordinator.interval)
+            try:
+                await self._rebalance_shards(coordinator, start_shard)
+            except Exception as e:
+                self.logger.error(f"Error rebalancing shards of queue {coordinator.group}: {e}")
+
+    async def _rebalance_shards(self, coordinator: ShardCoordinator, start_shard: Callable):
+        """
+        Stops consuming the shards this instance lost, waiting for their
+        queued work, then starts consuming the shards it gained.
+        """
+        acquired, released = await coordinator.rebalance()
+        for shard in released:
+            consumer = self.consumers.pop(shard, None)
+            if consumer is not None:
+                await consumer.stop()
+            await self.executors[shard].join()
+        for shard in acquired:
+            await start_shard(shard)
+        if acquired or released:
+            self.logger.log(
+                f"Rebalanced queue {coordinator.group}: consuming {len(coordinator.owned)} of "
+                f"{len(coordinator.shards)} shards across {len(coordinator.members)} members")
+
+    async def _start_consumer(self, queue_name: str, queue: aio_pika.abc.AbstractQueue,
+                              on_message: Callable, prefetch_count: Optional[int] = None):
+        """
+        Starts consuming a queue on the shared channel (with the subscriber's
+        prefetch unless given) and makes sure the backpressure and queue
+        depth monitors, if enabled, are running.
+        """
+        consumer = _Consumer(queue, self.channel, on_message, prefetch_count or self.prefetch_count)
+        await consumer.start()
+        self.consumers[queue_name] = consumer
+        if self.backpressure is not None and self._backpressure_task is None:
+            self._backpressure_task = asyncio.create_task(self._monitor_backpressure())
+        if self.depth_monitor is not None and self._depth_task is None:
+            self._depth_task = asyncio.create_task(self._monitor_depth())
+
+    async def _monitor_backpressure(self):
+        while True:
+            await asyncio.sleep(self.backpressure.interval)
+            for queue_name, consumer in list(self.consumers.items()):
+                # Restarting a stream consumer would rewind it to its start
+                # offset, so streams are left to their own prefetch.
+                if queue_name not in self.pools or queue_name in self.stream_offsets \
+                        or queue_name in self._breaker_paused:
+                    continue
+                try:
+                    await self._apply_backpressure(queue_name, consumer)
+                except aio_pika.AMQPError as e:
+                    self.logger.error(f"Error adjusting consumption of queue {queue_name}: {e}")
+
+    async def _apply_backpressure(self, queue_name: str, consumer: _Consumer):
+        pool = self.pools[queue_name]
+        prefetch, paused = self.backpressure.evaluate(
+            pool, consumer.prefetch_count, consumer.paused
+        )
+        # With the depth monitor sizing the pool, deliveries beyond its slots
+        # would only wait for one, so the prefetch follows the pool size.
+        if self.depth_monitor is not None and self.depth_monitor.max_pool_size is not None:
+            prefetch = min(prefetch, pool.size)
+        if paused == consumer.paused and prefetch == consumer.prefetch_count:
+            return
+
+        if paused:
+            self.logger.warn(
+                f"Pausing queue {queue_name}: latency {pool.latency:.3f}s, "
+                f"{pool.in_flight} in flight, {pool.waiting} waiting")
+            await consumer.stop()
+            return
+
+        # A new prefetch only applies to consumers started after basic.qos,
+        # so the consumer is restarted; unacked deliveries stay valid.
+        if consumer.paused:
+            self.logger.log(f"Resuming queue {queue_name} with prefetch {prefetch}")
+            pool.reset_latency()
+        else:
+            self.logger.log(f"Adjusting prefetch of queue {queue_name}: {consumer.prefetch_count} -> {prefetch}")
+            await consumer.stop()
+        consumer.prefetch_count = prefetch
+        await consumer.start()
+
+    async def _monitor_depth(self):
+        while True:
+            await asyncio.sleep(self.depth_monitor.interval)
+            for queue_name, consumer in list(self.consumers.items()):
+                if queue_name not in self.pools or queue_name in self.stream_offsets:
+                    continue
+                try:
+                    await self._sample_depth(queue_name, consumer)
+                except aio_pika.AMQPError as e:
+                    self.logger.error(f"Error sampling depth of queue {queue_name}: {e}")
+
+    async def _sample_depth(self, queue_name: str, consumer: _Consumer):
+        """
+        Reads a queue's message and consumer counts with a passive declare and
+        resizes its handler pool if the depth monitor asks for it.
+        """
+        # A failed passive declare closes its channel, so it gets one of its own.
+        if self._depth_channel is None or self._depth_channel.is_closed:
+            self._depth_channel = await self.connection.channel()
+        queue = await self._depth_channel.declare_queue(queue_name, passive=True)
+        pool = self.pools[queue_name]
+        depth = self.queue_depths.get(queue_name)
+        if depth is None:
+            spec = self.queue_specs.get(queue_name)
+            depth = self.queue_depths[queue_name] = QueueDepth(
+                queue_name, spec.max_length if spec else None, self.depth_monitor.smoothing
+            )
+        depth.update(
+            queue.declaration_result.message_count,
+            queue.declaration_result.consumer_count,
+            pool.processed + pool.in_flight + pool.waiting,
+        )
+
+        size = self.depth_monitor.evaluate(depth, pool)
+        if size == pool.size:
+            return
+        self.logger.log(
+            f"Resizing handler pool of queue {queue_name}: {pool.size} -> {size} "
+            f"(backlog {depth.backlog}, drain time {depth.drain_time})")
+        await pool.resize(size)
+        # More slots than deliveries in flight would sit idle; backpressure,
+        # when enabled, owns the prefetch instead and keeps it within the pool.
+        if self.backpressure is None and not consumer.paused and size > consumer.prefetch_count:
+            await consumer.stop()
+            consumer.prefetch_count = size
+            await consumer.start()
+
+    async def _declare_queue(self, channel: aio_pika.abc.AbstractChannel, queue_name: str,
+                             exchange: Optional[str] = None, routing_key: str = "",
+                             spec: Optional[QueueSpec] = None, arguments: Optional[dict] = None,
+                             bind_arguments: Optional[dict] = None):
+        """
+        Declares a subscription queue shaped by `spec` (by default the
+        subscriber's `queue_spec`), binds it to `exchange` (the subscriber's
+        exchange by default) and declares its retry queues. `arguments` are
+        added to the spec's arguments and `bind_arguments` go to the binding.
+
+        The broker refuses to redeclare a queue with different arguments, so
+        changing the spec of an existing queue means deleting it or using a
+        new queue name.
+        """
+        spec = spec or self.queue_spec or QueueSpec(
+            message_ttl=self.message_ttl, max_length=self.max_message_count
+        )
+        self.queue_specs[queue_name] = spec
+        queue = await channel.declare_queue(
+            queue_name,
+            durable=True,
+            auto_delete=False,
+            arguments={**spec.arguments(self.dead_letter_exchange), **(arguments or {})},
+        )
+        await queue.bind(
+            exchange=exchange or self.exchange_name, routing_key=routing_key, arguments=bind_arguments
+        )
+        await self._declare_retry_queues(channel, queue_name)
+        return queue
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Number of callbacks currently running across all subscribed queues.
+        """
+        return sum(pool.in_flight for pool in self.pools.values())
+
+    def get_metrics(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns handler pool, ordered executor and batcher counters keyed by
+        queue name.
+        """
+        metrics = {name: pool.stats() for name, pool in self.pools.items()}
+        for name, consumer in self.consumers.items():
+            metrics.setdefault(name, {}).update(
+                prefetch=consumer.prefetch_count, paused=consumer.paused
+            )
+        for name, executor in self.executors.items():
+            metrics.setdefault(name, {}).update(
+                {f"ordered_{key}": value for key, value in executor.stats().items()}
+            )
+        metrics.update({name: batcher.stats() for name, batcher in self.batchers.items()})
+        for name, tracker in self.stream_offsets.items():
+            metrics.setdefault(name, {}).update(tracker.stats())
+        for name, coordinator in self.shard_coordinators.items():
+            metrics.setdefault(name, {}).update(coordinator.stats())
+        for name, breaker in self.breakers.items():
+            metrics.setdefault(name, {}).update(breaker.stats())
+        for name, depth in self.queue_depths.items():
+            metrics.setdefault(name, {}).update(depth.stats())
+        return metrics
+
+    @staticmethod
+    def _get_request_id(message: aio_pika.IncomingMessage) -> str:
+        return (message.headers or {}).get("request_id") or str(uuid.uuid4())
+
+    async def _is_duplicate(self, message: aio_pika.IncomingMessage, queue_name: str) -> bool:
+        request_id = (message.headers or {}).get("request_id")
+        if self.dedup is None or not request_id:
+            return False
+        if await self.dedup.is_done(queue_name, request_id):
+            self.logger.debug(f"Skipping already processed message (Request ID: {request_id})")
+            return True
+        return False
+
+    async def _mark_processed(self, message: aio_pika.IncomingMessage, queue_name: str):
+        request_id = (message.headers or {}).get("request_id")
+        if self.dedup is not None and request_id:
+            await self.dedup.mark_done(queue_name, request_id)
+
+    def _capture(self, message: aio_pika.IncomingMessage, queue_name: str, received_at: float,
+                 outcome: str):
+        if self.recorder is not None:
+            self.recorder.record(
+                message, queue_name, received_at, time.monotonic() - received_at, outcome
+            )
+
+    async def _consume_message(self, callback, pool: HandlerPool, lazy: bool = False,
+                               breaker: Optional[CircuitBreaker] = None):
         async def on_message(message: aio_pika.IncomingMessage):
-            async with message.process():
+            received_at, outcome, calling = time.monotonic(), "failed", False
+            async with pool.slot(), message.process():
                 try:
-                    request_id = message.headers.get("request_id") if message.headers else str(
-                        uuid.uuid4())
+                    request_id = self._get_request_id(message)
+                    if await self._is_duplicate(message, pool.name):
+                        outcome = "duplicate"
+                        return
+                    if breaker is not None:
+                        if not breaker.allow():
+                            outcome = "deferred"
+                            await self._defer_message(message, request_id, pool.name, breaker)
+                            return
+                        calling = True
                     self.logger.log(f"Processing message with Request ID: {request_id}")
 
-                    message_data = await self._deserialize_and_validate_message(message)
+                    if lazy:
+                        message_data = MessageEnvelope(message, request_id, self._decode_message)
+                    else:
+                        message_data = await self._deserialize_and_validate_message(message)
                     await callback(message_data, request_id)
+                    if calling:
+                        calling = False
+                        breaker.record_success()
+                    await self._mark_processed(message, pool.name)
+                    outcome = "processed"
                 except ValueError as e:
                     self.logger.error(f"Deserialization/Validation failed (Request ID: {request_id}): {e}")
-                    await self._handle_failed_message(message, request_id)
+                    if calling:
+                        self._record_breaker_failure(breaker, e, pool.name)
+                    await self._handle_failed_message(message, request_id, e, pool.name)
                 except Exception as e:
                     self.logger.error(f"Unexpected error (Request ID: {request_id}): {e}")
-                    await self._handle_failed_message(message, request_id)
+                    if calling:
+                        self._record_breaker_failure(breaker, e, pool.name)
+                    await self._handle_failed_message(message, request_id, e, pool.name)
+                finally:
+                    self._capture(message, pool.name, received_at, outcome)
 
         return on_message
 
+    def _register_breaker(self, queue_name: str, breaker: Optional[CircuitBreaker]):
+        if breaker is not None:
+            self.breakers[queue_name] = breaker
+
+    def _record_breaker_failure(self, breaker: CircuitBreaker, error: BaseException, queue_name: str):
+        """
+        Counts a callback failure against its breaker. Permanent failures say
+        nothing about the downstream dependency, so they are not counted.
+        """
+        if self.classifier.classify(error) == PERMANENT:
+            breaker.release()
+        elif breaker.record_failure():
+            self.logger.warn(
+                f"Circuit breaker of queue {queue_name} opened for {breaker.open_timeout}s "
+                f"at failure ratio {breaker.failure_ratio:.2f}")
+            if breaker.pause:
+                self._pause_for_breaker(queue_name, breaker)
+
+    async def _defer_message(self, message: aio_pika.IncomingMessage, request_id,
+                             queue_name: str, breaker: CircuitBreaker):
+        """
+        Sends a delivery turned away by an open breaker to the shortest delay
+        queue outlasting the breaker's open time, without counting a retry.
+        With no transient retry tiers it is dead-lettered instead.
+        """
+        if breaker.pause:
+            self._pause_for_breaker(queue_name, breaker)
+        tiers = self.retry_policies[TRANSIENT].tiers
+        if tiers is None:
+            await self._dead_letter(message, request_id, TRANSIENT, queue_name)
+            return
+        delay = min(
+            (delay for delay in tiers.delays if delay >= breaker.remaining * 1000),
+            default=max(tiers.delays),
+        )
+        self.logger.debug(
+            f"Circuit breaker of queue {queue_name} {breaker.state}, deferring message "
+            f"by {delay}ms (Request ID: {request_id})")
+        await self.publisher.publish(
+            self._build_message(message, {"x-origin-queue": queue_name, "request_id": request_id}),
+            routing_key=tiers.queue_name(queue_name, delay),
+            exchange=self.retry_exchange,
+        )
+
+    def _pause_for_breaker(self, queue_name: str, breaker: CircuitBreaker):
+        consumer = self.consumers.get(queue_name)
+        if queue_name in self._breaker_paused or consumer is None or consumer.paused:
+            return
+        self._breaker_paused.add(queue_name)
+        task = asyncio.create_task(self._hold_breaker_pause(queue_name, consumer, breaker))
+        self._breaker_tasks.add(task)
+        task.add_done_callback(self._breaker_tasks.discard)
+
+    async def _hold_breaker_pause(self, queue_name: str, consumer: _Consumer, breaker: CircuitBreaker):
+        """
+        Stops consuming a queue until its open breaker turns half-open.
+        """
+        try:
+            self.logger.warn(f"Pausing queue {queue_name} for {breaker.remaining:.1f}s: circuit breaker open")
+            await consumer.stop()
+            await asyncio.sleep(breaker.remaining)
+            if self.consumers.get(queue_name) is consumer:
+                self.logger.log(f"Resuming queue {queue_name}: circuit breaker half-open")
+                await consumer.start()
+        except aio_pika.AMQPError as e:
+            self.logger.error(f"Error pausing queue {queue_name} for its circuit breaker: {e}")
+        finally:
+            self._breaker_paused.discard(queue_name)
+
+    async def _consume_stream(self, callback, pool: HandlerPool, tracker: StreamOffsetTracker):
+        async def on_message(message: aio_pika.IncomingMessage):
+            received_at, outcome = time.monotonic(), "failed"
+            async with pool.slot():
+                request_id = self._get_request_id(message)
+                try:
+                    message_data = await self._deserialize_and_validate_message(message)
+                    await callback(message_data, request_id)
+                    outcome = "processed"
+                except Exception as e:
+                    self.logger.error(f"Stream message failed (Request ID: {request_id}): {e}")
+                    await self._dead_letter(
+                        message, request_id, self.classifier.classify(e), pool.name
+                    )
+                await message.ack()
+                self._capture(message, pool.name, received_at, outcome)
+                await tracker.processed((message.headers or {}).get("x-stream-offset"))
+
+        return on_message
+
+    def _consume_batch(self, callback, queue_name: str):
+        async def on_batch(messages: List[aio_pika.IncomingMessage]):
+            received_at = time.monotonic()
+            last = max(messages, key=lambda message: message.delivery_tag)
+            try:
+                decoded, delivered, failed = [], [], []
+                for message in messages:
+                    if await self._is_duplicate(message, queue_name):
+                        continue
+                    request_id = self._get_request_id(message)
+                    try:
+                        decoded.append(await self._deserialize_and_validate_message(message))
+                        delivered.append((message, request_id))
+                    except ValueError as e:
+                        self.logger.error(f"Deserialization/Validation failed (Request ID: {request_id}): {e}")
+                        failed.append((message, request_id, e))
+
+                self.logger.log(f"Processing batch of {len(decoded)} messages")
+                if decoded:
+                    error = None
+                    try:
+                        failed_indexes = await callback(
+                            decoded, [request_id for _, request_id in delivered]
+                        ) or ()
+                    except Exception as e:
+                        self.logger.error(f"Unexpected error in batch of {len(decoded)} messages: {e}")
+                        failed_indexes, error = range(len(delivered)), e
+                    failed_indexes = set(failed_indexes)
+                    failed.extend((*delivered[index], error) for index in failed_indexes)
+                    for index, (message, _) in enumerate(delivered):
+                        if index not in failed_indexes:
+                            await self._mark_processed(message, queue_name)
+
+                for message, request_id, error in failed:
+                    await self._handle_failed_message(message, request_id, error, queue_name)
+                failed_messages = {id(message) for message, _, _ in failed}
+                for message in messages:
+                    self._capture(
+                        message, queue_name, received_at,
+                        "failed" if id(message) in failed_messages else "processed",
+                    )
+            except Exception as e:
+                self.logger.error(f"Batch of {len(messages)} messages requeued: {e}")
+                await last.nack(multiple=True, requeue=True)
+                return
+
+            await last.ack(multiple=True)
+
+        return on_batch
+
     async def _deserialize_and_validate_message(self, message: aio_pika.IncomingMessage):
+        return self._decode_message(message)
+
+    def _decode_message(self, message: aio_pika.IncomingMessage):
         try:
-            message_data = json.loads(message.body)
-            validate_message_schema(message_data)
+            message_data = self.codecs.decode(message.body, message.content_type)
+            self.schemas.validate(message_data, message.headers, message.user_id)
             return message_data
-        except (json.JSONDecodeError, ValueError) as e:
-            raise ValueError(f"Invalid message format: {e}")
+        except ValueError as e:
+            raise InvalidMessageError(f"Invalid message format: {e}")
 
-    async def _handle_failed_message(self, message: aio_pika.IncomingMessage, request_id):
+    async def _handle_failed_message(self, message: aio_pika.IncomingMessage, request_id,
+                                     error: Optional[BaseException], queue_name: str):
+        """
+        Classifies the failure and schedules a retry through that class's
+        delay queues for `queue_name`, or dead-letters the message when the failure is
+        permanent or retries are exhausted. Only waits for the publisher
+        confirm, so the delivery is acked as soon as the copy is safely with
+        the broker.
+        """
+        failure_class = self.classifier.classify(error)
+        policy = self.retry_policies[failure_class]
         retries = (message.headers or {}).get("x-retries", 0)
-        if retries < self.max_retries:
+        if retries < policy.max_retries:
             retries += 1
-            await asyncio.sleep(2 ** retries)
-            self.logger.warning(f"Retry {retries}/{self.max_retries} for message (Request ID: {request_id})")
-
-            await self.channel.exchange(self.retry_exchange).publish(
-                aio_pika.Message(
-                    body=message.body,
-                    headers={
-                        "x-retries": retries,
-                        "request_id": request_id
-                    }
-                ),
-                routing_key="retry_queue"
+            routing_key = policy.tiers.routing_key_for(queue_name, retries)
+            self.logger.warn(
+                f"Retry {retries}/{policy.max_retries} ({failure_class}) via {routing_key} "
+                f"for message (Request ID: {request_id})")
+
+            await self.publisher.publish(
+                self._build_message(message, {
+                    "x-retries": retries,
+                    "x-failure-class": failure_class,
+                    "x-origin-queue": queue_name,
+                    "request_id": request_id,
+                }),
+                routing_key=routing_key,
+                exchange=self.retry_exchange,
             )
         else:
             self.logger.warn(
-                f"Message moved to dead-letter queue after {retries} retries (Request ID: {request_id})")
-            await self.channel.exchange(self.dead_letter_exchange).publish(
-                aio_pika.Message(
-                    body=message.body,
-                    headers={
-                        "request_id": request_id
-                    }
-                )
-            )
-    async def close(self):
+                f"Message moved to dead-letter queue after {retries} retries ({failure_class}) "
+                f"(Request ID: {request_id})")
+            await self._dead_letter(message, request_id, failure_class, queue_name)
+
+    async def _dead_letter(self, message: aio_pika.IncomingMessage, request_id,
+                           failure_class: str, queue_name: str):
+        await self.publisher.publish(
+            self._build_message(message, {
+                "x-failure-class": failure_class,
+                "x-origin-queue": queue_name,
+                "request_id": request_id,
+                DEAD_LETTERED_AT_HEADER: datetime.now(timezone.utc),
+            }),
+            exchange=self.dead_letter_exchange,
+        )
+
+    @staticmethod
+    def _build_message(message: aio_pika.IncomingMessage, headers: dict) -> aio_pika.Message:
+        """
+        Copies a delivery into a new persistent message, merging in `headers`.
+        """
+        return aio_pika.Message(
+            body=message.body,
+            headers={**(message.headers or {}), **headers},
+            content_type=message.content_type,
+            content_encoding=message.content_encoding,
+            message_id=message.message_id,
+            timestamp=message.timestamp,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+        )
+
+    def _stop_monitors(self):
+        for task in (self._backpressure_task, self._depth_task, *self._shard_tasks, *self._breaker_tasks):
+            if task is not None:
+                task.cancel()
+        self._backpressure_task = self._depth_task = None
+        self._shard_tasks = []
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Stops consuming and waits up to `timeout` seconds (default
+        `drain_timeout`) for buffered batches, in-flight callbacks and pending
+        publishes to finish. Returns False if the deadline was hit.
+        """
+        self._stop_monitors()
+        for queue_name, consumer in self.consumers.items():
+            try:
+                await consumer.stop()
+            except aio_pika.AMQPError as e:
+                self.logger.error(f"Error cancelling consumer of queue {queue_name}: {e}")
+
+        async def wait_for_work():
+            for batcher in self.batchers.values():
+                await batcher.flush()
+            for executor in self.executors.values():
+                await executor.join()
+            for pool in self.pools.values():
+                await pool.wait_idle()
+            await self.publisher.flush()
+            for tracker in self.stream_offsets.values():
+                await tracker.commit()
+
+        timeout = self.drain_timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(wait_for_work(), timeout)
+        except asyncio.TimeoutError:
+            self.logger.warn(
+                f"Drain timed out after {timeout}s with {self.in_flight} callbacks in flight "
+                f"and {self.publisher.pending} publishes pending")
+            return False
+        self.logger.log("Drained all in-flight messages.")
+        return True
+
+    async def close(self, drain: bool = True):
         """
-        Closes the channel and connection.
+        Closes the channel and connection, draining in-flight work first
+        unless `drain` is False. Deliveries still unfinished after the drain
+        are requeued by the broker, not dead-lettered.
         """
         try:
-            await self.channel.close()
+            if drain:
+                await self.drain()
+            else:
+                self._stop_monitors()
+            # Closing the consuming channels makes the broker requeue whatever
+            # is still unacked. Cancelling the ordered lanes first would make
+            # `message.process()` reject those deliveries to the dead-letter
+            # exchange instead.
+            channels = {id(channel): channel for channel in (
+                self.channel, *(consumer.channel for consumer in self.consumers.values())
+            )}
+            for channel in channels.values():
+                if not channel.is_closed:
+                    await channel.close()
+            for executor in self.executors.values():
+                await executor.close()
+            await self.offloader.shutdown()
+            await self.publisher.close()
+            if self.dedup is not None:
+                await self.dedup.close()
+            for tracker in self.stream_offsets.values():
+                await tracker.store.close()
+            for coordinator in self.shard_coordinators.values():
+                await coordinator.leave()
+                await coordinator.membership.close()
+            if self.recorder is not None:
+                self.recorder.close()
+            if self._depth_channel is not None and not self._depth_channel.is_closed:
+                await self._depth_channel.close()
             await self.connection.close()
             self.logger.log("Connection to RabbitMQ closed.")
         except Exception as e:
@@ -155,17 +1101,26 @@ class EventSubscriber:
             raise
 
 
-def create_handler(name):
+def create_handler(name, router: EventRouter = event_router):
+    codecs = default_codecs()
+
     async def on_event_received(message: aio_pika.IncomingMessage):
         async with message.process(ignore_processed=True):
-            message_body = message.body.decode("utf-8")
             try:
-                # Each message headers contain event_type, which can
-                # be used to assign handlers to different messages
-                pass
+                # Each message headers contain event_type, which selects
+                # the handler registered on the router
+                route = router.resolve(message.headers)
+                if route is None:
+                    raise LookupError(
+                        f"{name}: no handler for event type {router.event_type(message.headers)!r}"
+                    )
+
+                request_id = (message.headers or {}).get("request_id") or str(uuid.uuid4())
+                async with route.pool.slot():
+                    await route(codecs.decode(message.body, message.content_type), request_id)
 
             except Exception as e:
                 print("There was an error", e)
                 await message.reject(requeue=False)
 
-    return on_event_received
\ No newline at end of file
+    return on_event_received
@@ -0,0 +1,286 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import string
+import time
+import tracemalloc
+import uuid
+from typing import Any, Dict, List
+
+import inject
+
+from app.services.di import configure_injection
+from app.utils.consumer import EventSubscriber
+from app.utils.messaging import AMQPConnector
+from app.utils.messaging.fake_broker import FakeBroker
+
+REGRESSION_METRICS = {
+    # metric: True if higher is better
+    "throughput": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "p999_ms": False,
+}
+
+
+def auction_event(sequence: int, auctions: int, size: int) -> Dict[str, Any]:
+    """
+    Builds a bid-placed event, padded with metadata to roughly `size` bytes.
+    """
+    event = {
+        "event": "bid_placed",
+        "auction_id": f"auction-{sequence % auctions}",
+        "bid_id": str(uuid.uuid4()),
+        "bidder_id": f"user-{random.randrange(100_000)}",
+        "amount": round(random.uniform(1, 10_000), 2),
+        "currency": "USD",
+        "placed_at": time.time(),
+        "sequence": sequence,
+    }
+    padding = size - len(json.dumps(event))
+    if padding > 0:
+        event["metadata"] = {"note": "".join(random.choices(string.ascii_letters, k=padding))}
+    return event
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class ConsumerBenchmark:
+    """
+    Drives an EventSubscriber with auction events at a configurable rate,
+    payload size and failure ratio, and measures end-to-end processing
+    latency (publish to callback completion), throughput, retry overhead
+    and traced memory per outstanding (published, unprocessed) message.
+
+    Failing messages fail on their first delivery only, so every message
+    eventually completes and retry cost shows up as extra latency.
+    """
+
+    def __init__(
+        self,
+        messages: int = 10_000,
+        rate: float = 0.0,
+        payload_size: int = 512,
+        failure_ratio: float = 0.0,
+        handler_ms: float = 0.0,
+        auctions: int = 100,
+        trace_memory: bool = False,
+        timeout: float = 120.0,
+    ):
+        self.messages = messages
+        self.rate = rate
+        self.payload_size = payload_size
+        self.failure_ratio = failure_ratio
+        self.handler_ms = handler_ms
+        self.auctions = auctions
+        self.trace_memory = trace_memory
+        self.timeout = timeout
+        self.latencies: List[float] = []
+        self.retried_latencies: List[float] = []
+        self.failures = 0
+        self.peak_in_flight = 0
+        self.peak_outstanding = 0
+        self._done = asyncio.Event()
+
+    async def _callback(self, message_data: Dict[str, Any], request_id: str, subscriber: EventSubscriber,
+                        sent_at: Dict[str, float], failing: set):
+        self.peak_in_flight = max(self.peak_in_flight, subscriber.in_flight)
+        if self.handler_ms:
+            await asyncio.sleep(self.handler_ms / 1000)
+        if request_id in failing:
+            failing.discard(request_id)
+            self.failures += 1
+            raise RuntimeError("benchmark failure")
+
+        latency = time.perf_counter() - sent_at[request_id]
+        self.latencies.append(latency)
+        if message_data.get("retried"):
+            self.retried_latencies.append(latency)
+        if len(self.latencies) >= self.messages:
+            self._done.set()
+
+    async def run(self, subscriber: EventSubscriber) -> Dict[str, Any]:
+        """
+        Publishes the workload through `subscriber.publisher` and waits until
+        every message has been processed or the timeout expires.
+        """
+        sent_at: Dict[str, float] = {}
+        failing = set()
+        queue_name = f"{subscriber.exchange_name}.bench"
+
+        async def callback(message_data, request_id):
+            await self._callback(message_data, request_id, subscriber, sent_at, failing)
+
+        await subscriber.subscribe_events(queue_name, callback)
+        if self.trace_memory:
+            tracemalloc.start()
+
+        interval = 1.0 / self.rate if self.rate else 0.0
+        started = time.perf_counter()
+        pending = []
+        for sequence in range(self.messages):
+            request_id = f"bench-{sequence}"
+            if random.random() < self.failure_ratio:
+                failing.add(request_id)
+            event = auction_event(sequence, self.auctions, self.payload_size)
+            event["retried"] = request_id in failing
+            sent_at[request_id] = time.perf_counter()
+            pending.append(subscriber.publisher.publish(
+                event, headers={"request_id": request_id, "auction_id": event["auction_id"]}
+            ))
+            self.peak_outstanding = max(self.peak_outstanding, len(sent_at) - len(self.latencies))
+            if interval:
+                delay = started + (sequence + 1) * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif len(pending) >= 1000:
+                await asyncio.gather(*pending)
+                pending.clear()
+        await asyncio.gather(*pending)
+
+        try:
+            await asyncio.wait_for(self._done.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+
+        memory_per_message = None
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            memory_per_message = round(peak / max(self.peak_outstanding, 1))
+
+        completed = len(self.latencies)
+        return {
+            "messages": self.messages,
+            "completed": completed,
+            "lost": self.messages - completed,
+            "elapsed_s": round(elapsed, 3),
+            "throughput": round(completed / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(self.latencies, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(self.latencies, 0.99) * 1000, 3),
+            "p999_ms": round(percentile(self.latencies, 0.999) * 1000, 3),
+            "retries": self.failures,
+            "retried_p50_ms": round(percentile(self.retried_latencies, 0.50) * 1000, 3),
+            "peak_in_flight": self.peak_in_flight,
+            "peak_outstanding": self.peak_outstanding,
+            "memory_per_message_bytes": memory_per_message,
+        }
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any],
+                        tolerance: float) -> List[str]:
+    """
+    Returns a description of each metric that regressed by more than
+    `tolerance` (a fraction) against the baseline.
+    """
+    regressions = []
+    for metric, higher_is_better in REGRESSION_METRICS.items():
+        expected, actual = baseline.get(metric), results.get(metric)
+        if not expected or actual is None:
+            continue
+        change = (actual - expected) / expected
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f"{metric}: {expected} -> {actual} ({change:+.1%})")
+    return regressions
+
+
+async def delete_topology(subscriber: EventSubscriber):
+    """
+    Deletes the exchanges and queues a benchmark run declared on a real
+    broker: its subscribed queues with their retry queues and its own
+    exchanges. The shared dead-letter queue and retry exchange are kept.
+    """
+    queues = set(subscriber.pools)
+    for queue_name in list(queues):
+        for policy in subscriber.retry_policies.values():
+            if policy.tiers is not None:
+                queues.update(policy.tiers.queue_name(queue_name, delay) for delay in policy.tiers.delays)
+
+    connection = await subscriber.connector.connect(subscriber.connection_url)
+    try:
+        channel = await connection.channel()
+        for queue_name in sorted(queues):
+            await channel.queue_delete(queue_name)
+        for exchange_name in (subscriber.exchange_name, subscriber.dead_letter_exchange):
+            await channel.exchange_delete(exchange_name)
+    finally:
+        await connection.close()
+
+
+async def _main(args) -> int:
+    inject.configure_once(configure_injection)
+    connector: AMQPConnector = FakeBroker(ttl_scale=args.ttl_scale) if args.broker == "fake" \
+        else inject.instance(AMQPConnector)
+
+    subscriber = EventSubscriber(
+        f"bench_events_{os.getpid()}",
+        f"bench_dlx_{os.getpid()}",
+        connector=connector,
+        prefetch_count=args.prefetch,
+    )
+    # Measure the consumer, not the queue's length cap dropping the backlog.
+    subscriber.max_message_count = max(subscriber.max_message_count, args.messages)
+    await subscriber.connect()
+    benchmark = ConsumerBenchmark(
+        messages=args.messages,
+        rate=args.rate,
+        payload_size=args.payload_size,
+        failure_ratio=args.failure_ratio,
+        handler_ms=args.handler_ms,
+        auctions=args.auctions,
+        trace_memory=args.memory,
+        timeout=args.timeout,
+    )
+    try:
+        results = await benchmark.run(subscriber)
+    finally:
+        await subscriber.close(drain=False)
+        # Each run declares durable, pid-named topology; don't leave it behind.
+        if args.broker != "fake":
+            await delete_topology(subscriber)
+    results["broker"] = args.broker
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            regressions = compare_to_baseline(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark EventSubscriber throughput and latency.")
+    parser.add_argument("--broker", choices=("fake", "rabbitmq"), default="fake")
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--rate", type=float, default=0.0, help="messages per second, 0 for unthrottled")
+    parser.add_argument("--payload-size", type=int, default=512, help="approximate bytes per event")
+    parser.add_argument("--failure-ratio", type=float, default=0.0)
+    parser.add_argument("--handler-ms", type=float, default=0.0, help="simulated work per callback")
+    parser.add_argument("--auctions", type=int, default=100)
+    parser.add_argument("--prefetch", type=int, default=50)
+    parser.add_argument("--ttl-scale", type=float, default=1.0, help="fake broker TTL multiplier")
+    parser.add_argument("--memory", action="store_true", help="trace memory per outstanding message")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--baseline", default="consumer_benchmark_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression fraction")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(_main(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import aio_pika
+import inject
+
+from app.services.di import configure_injection
+from app.utils.consumer import DEAD_LETTERED_AT_HEADER, EventSubscriber
+
+REPLAY_DROPPED_HEADERS = (
+    "x-retries", "x-failure-class", "x-death", "x-origin-queue", DEAD_LETTERED_AT_HEADER,
+)
+
+
+class DeadLetterReplayer:
+    """
+    Streams messages from an EventSubscriber's dead-letter queue back to where
+    they came from, at a bounded rate.
+
+    The queue is read with basic.get on a dedicated channel, up to the number
+    of messages present when the replay starts. Matching messages are acked
+    once their replayed copy is confirmed; everything else (and everything,
+    in a dry run) is requeued at the end, so nothing is lost.
+    """
+
+    def __init__(
+        self,
+        subscriber: EventSubscriber,
+        rate: float = 100.0,
+        headers: Optional[Dict[str, Any]] = None,
+        request_ids: Iterable[str] = (),
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        dry_run: bool = False,
+        confirm_window: int = 100,
+    ):
+        """
+        `rate` is in messages per second. `headers` must all match exactly;
+        `since`/`until` filter on the time the message was dead-lettered.
+        """
+        self.subscriber = subscriber
+        self.rate = rate
+        self.headers = headers or {}
+        self.request_ids = frozenset(request_ids)
+        self.since = since
+        self.until = until
+        self.limit = limit
+        self.dry_run = dry_run
+        self.confirm_window = confirm_window
+        self.logger = subscriber.logger
+
+    @staticmethod
+    def _dead_lettered_at(message: aio_pika.IncomingMessage) -> Optional[datetime]:
+        """
+        Returns when EventSubscriber dead-lettered the message, or when the
+        broker did according to `x-death`.
+        """
+        headers = message.headers or {}
+        deaths = headers.get("x-death") or []
+        timestamp = headers.get(DEAD_LETTERED_AT_HEADER)
+        if timestamp is None:
+            timestamp = deaths[0].get("time") if deaths else message.timestamp
+        if timestamp is not None and timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp
+
+    def matches(self, message: aio_pika.IncomingMessage) -> bool:
+        headers = message.headers or {}
+        if any(headers.get(key) != value for key, value in self.headers.items()):
+            return False
+        if self.request_ids and headers.get("request_id") not in self.request_ids:
+            return False
+        if self.since or self.until:
+            timestamp = self._dead_lettered_at(message)
+            if timestamp is None:
+                return False
+            if self.since and timestamp < self.since:
+                return False
+            if self.until and timestamp > self.until:
+                return False
+        return True
+
+    def target(self, message: aio_pika.IncomingMessage) -> Tuple[str, str]:
+        """
+        Returns the (exchange, routing key) to replay a message to. Messages
+        dead-lettered by EventSubscriber (`x-origin-queue`) or by the broker
+        (the queue in the latest `x-death` entry, e.g. an overflow drop or a
+        TTL expiry) go straight back to that queue through the default
+        exchange, so other queues bound to the subscriber's exchange do not
+        get a second copy. Only messages that never reached a queue, such as
+        alternate-exchange unroutables, are republished to the exchange.
+        """
+        headers = message.headers or {}
+        if headers.get("x-origin-queue"):
+            return "", headers["x-origin-queue"]
+        deaths = headers.get("x-death") or []
+        if deaths and deaths[0].get("queue"):
+            return "", deaths[0]["queue"]
+        if deaths:
+            routing_keys = deaths[0].get("routing-keys") or [""]
+            return deaths[0].get("exchange", self.subscriber.exchange_name), routing_keys[0]
+        return self.subscriber.exchange_name, ""
+
+    @staticmethod
+    def _replay_message(message: aio_pika.IncomingMessage) -> aio_pika.Message:
+        headers = {
+            key: value for key, value in (message.headers or {}).items()
+            if key not in REPLAY_DROPPED_HEADERS
+        }
+        headers["x-replayed"] = True
+        return aio_pika.Message(
+            body=message.body,
+            headers=headers,
+            content_type=message.content_type,
+            content_encoding=message.content_encoding,
+            message_id=message.message_id,
+            timestamp=message.timestamp,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+        )
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Replays matching messages and returns a summary.
+        """
+        channel = await self.subscriber.connection.channel()
+        queue = await channel.declare_queue(self.subscriber.dead_letter_queue, passive=True)
+        total = queue.declaration_result.message_count
+        if self.limit is not None:
+            total = min(total, self.limit)
+
+        summary = {"scanned": 0, "matched": 0, "replayed": 0, "failed": 0, "dry_run": self.dry_run}
+        targets, failure_classes = Counter(), Counter()
+        held: List[aio_pika.IncomingMessage] = []
+        window: List[Tuple[aio_pika.IncomingMessage, asyncio.Future]] = []
+        interval = 1.0 / self.rate if self.rate else 0.0
+        next_send = time.monotonic()
+
+        try:
+            while summary["scanned"] < total:
+                message = await queue.get(no_ack=False, fail=False)
+                if message is None:
+                    break
+                summary["scanned"] += 1
+                if not self.matches(message):
+                    held.append(message)
+                    continue
+
+                summary["matched"] += 1
+                exchange, routing_key = self.target(message)
+                targets[f"{exchange or '(default)'}:{routing_key}"] += 1
+                failure_classes[(message.headers or {}).get("x-failure-class", "unknown")] += 1
+                if self.dry_run:
+                    held.append(message)
+                    continue
+
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_send = max(next_send, time.monotonic()) + interval
+
+                window.append((message, self.subscriber.publisher.publish(
+                    self._replay_message(message), routing_key=routing_key, exchange=exchange
+                )))
+                if len(window) >= self.confirm_window:
+                    await self._settle(window, held, summary)
+            await self._settle(window, held, summary)
+        finally:
+            for message in held:
+                await message.nack(requeue=True)
+            await channel.close()
+
+        summary["targets"] = dict(targets)
+        summary["failure_classes"] = dict(failure_classes)
+        self.logger.log("Dead-letter replay finished", metadata=summary)
+        return summary
+
+    async def _settle(self, window, held, summary):
+        """
+        Acks replayed messages once confirmed; unconfirmed ones are requeued.
+        """
+        results = await asyncio.gather(*(future for _, future in window), return_exceptions=True)
+        for (message, _), result in zip(window, results):
+            if isinstance(result, BaseException):
+                summary["failed"] += 1
+                held.append(message)
+            else:
+                summary["replayed"] += 1
+                await message.ack()
+        window.clear()
+
+
+def _parse_time(value: str) -> datetime:
+    timestamp = datetime.fromisoformat(value)
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+
+async def _main(args):
+    subscriber = EventSubscriber(args.exchange, args.dead_letter_exchange)
+    await subscriber.connect()
+    try:
+        summary = await DeadLetterReplayer(
+            subscriber,
+            rate=args.rate,
+            headers=dict(header.split("=", 1) for header in args.header),
+            request_ids=args.request_id,
+            since=_parse_time(args.since) if args.since else None,
+            until=_parse_time(args.until) if args.until else None,
+            limit=args.limit,
+            dry_run=args.dry_run,
+        ).run()
+    finally:
+        await subscriber.close()
+    print(json.dumps(summary, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay messages from the dead-letter queue.")
+    parser.add_argument("--exchange", required=True)
+    parser.add_argument("--dead-letter-exchange", required=True)
+    parser.add_argument("--rate", type=float, default=100.0, help="messages per second, 0 for unlimited")
+    parser.add_argument("--header", action="append", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--request-id", action="append", default=[])
+    parser.add_argument("--since", help="ISO timestamp")
+    parser.add_argument("--until", help="ISO timestamp")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    inject.configure_once(configure_injection)
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
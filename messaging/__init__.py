@@ -0,0 +1,43 @@
+from app.utils.messaging.connector import AMQPConnector
+from app.utils.messaging.pool import HandlerPool
+from app.utils.messaging.exceptions import InvalidMessageError, ThrottledError
+from app.utils.messaging.retry import (
+    PERMANENT,
+    THROTTLED,
+    TRANSIENT,
+    ErrorClassifier,
+    RetryPolicy,
+    RetryTiers,
+)
+from app.utils.messaging.batch import MessageBatcher
+from app.utils.messaging.codecs import Codec, CodecRegistry, default_codecs
+from app.utils.messaging.schemas import SchemaRegistry
+from app.utils.messaging.router import EventRouter, event_router
+from app.utils.messaging.ordering import KeyedExecutor, partition_key
+from app.utils.messaging.dedup import Deduplicator, LRUDedupCache, RedisDedupStore
+from app.utils.messaging.backpressure import BackpressureController
+from app.utils.messaging.depth import QueueDepth, QueueDepthMonitor
+from app.utils.messaging.streams import (
+    MemoryOffsetStore,
+    RedisOffsetStore,
+    StreamOffsetTracker,
+)
+from app.utils.messaging.offload import ASYNC, PROCESS, THREAD, CallbackOffloader
+from app.utils.messaging.capture import TrafficRecorder, TrafficReplayer
+from app.utils.messaging.envelope import MessageEnvelope
+from app.utils.messaging.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.utils.messaging.sharding import (
+    MemoryMembership,
+    RedisMembership,
+    ShardCoordinator,
+    assign_shards,
+)
+from app.utils.messaging.topology import (
+    CLASSIC,
+    DROP_HEAD,
+    LAZY,
+    QUORUM,
+    REJECT_PUBLISH,
+    REJECT_PUBLISH_DLX,
+    QueueSpec,
+)
@@ -0,0 +1,56 @@
+from typing import Tuple
+
+from app.utils.messaging.pool import HandlerPool
+
+
+class BackpressureController:
+    """
+    Decides a queue's prefetch and paused state from its handler pool.
+
+    While callbacks are slow or deliveries queue up behind a full pool, the
+    prefetch is halved down to `min_prefetch` and then the consumer is
+    paused. Once latency is back under `latency_low` with nothing waiting
+    (or a paused queue has drained), it resumes and grows the prefetch
+    again by `step` up to `max_prefetch`.
+    """
+
+    def __init__(
+        self,
+        min_prefetch: int = 1,
+        max_prefetch: int = 100,
+        latency_high: float = 1.0,
+        latency_low: float = 0.2,
+        max_waiting: int = 10,
+        step: int = 2,
+        interval: float = 1.0,
+    ):
+        """
+        Latencies and `interval` (how often queues are evaluated) are in seconds.
+        """
+        self.min_prefetch = min_prefetch
+        self.max_prefetch = max_prefetch
+        self.latency_high = latency_high
+        self.latency_low = latency_low
+        self.max_waiting = max_waiting
+        self.step = step
+        self.interval = interval
+
+    def evaluate(self, pool: HandlerPool, prefetch: int, paused: bool) -> Tuple[int, bool]:
+        """
+        Returns the prefetch count and paused flag the queue should have.
+        """
+        overloaded = pool.latency > self.latency_high or pool.waiting > self.max_waiting
+        recovered = (
+            pool.in_flight == 0 if paused
+            else pool.latency < self.latency_low and pool.waiting == 0
+        )
+
+        if paused:
+            return (prefetch, False) if recovered else (prefetch, True)
+        if overloaded:
+            if prefetch > self.min_prefetch:
+                return max(self.min_prefetch, prefetch // 2), False
+            return prefetch, True
+        if recovered and prefetch < self.max_prefetch:
+            return min(self.max_prefetch, prefetch + self.step), False
+        return prefetch, False
@@ -0,0 +1,75 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import aio_pika
+
+
+class MessageBatcher:
+    """
+    Buffers deliveries and hands them off in batches once a size or time
+    threshold is reached.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        batch_timeout: float,
+        on_batch: Callable[[List[aio_pika.IncomingMessage]], Awaitable[None]],
+    ):
+        """
+        Initializes the batcher. `batch_timeout` is in seconds and is measured
+        from the first message buffered after a flush.
+        """
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.batches = 0
+        self._on_batch = on_batch
+        self._buffer: List[aio_pika.IncomingMessage] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def add(self, message: aio_pika.IncomingMessage):
+        """
+        Adds a delivery to the buffer, flushing if the batch is full.
+        """
+        self._buffer.append(message)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch_timeout)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        """
+        Hands the buffered deliveries to the batch handler. Batches are
+        processed one at a time.
+        """
+        async with self._lock:
+            if self._timer is not None and self._timer is not asyncio.current_task():
+                self._timer.cancel()
+            self._timer = None
+            batch, self._buffer = self._buffer, []
+            if not batch:
+                return
+            self.batches += 1
+            await self._on_batch(batch)
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns a snapshot of the batcher counters.
+        """
+        return {
+            "batch_size": self.batch_size,
+            "pending": self.pending,
+            "batches": self.batches,
+        }
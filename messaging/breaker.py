@@ -0,0 +1,133 @@
+import time
+from collections import deque
+from typing import Deque, Dict, Union
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Tracks a callback's recent failure rate and stops calling it while a
+    downstream dependency is failing.
+
+    The breaker opens once at least `min_calls` of the last `window`
+    outcomes are recorded and the failed share reaches `failure_rate`.
+    After `open_timeout` seconds it turns half-open and lets up to
+    `half_open_probes` calls through at a time; that many successes close
+    it again, any failure reopens it.
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        open_timeout: float = 30.0,
+        half_open_probes: int = 3,
+        pause: bool = False,
+    ):
+        """
+        With `pause`, an open breaker stops consuming its queue until it
+        turns half-open; otherwise deliveries keep arriving and are deferred
+        to the delay queues without calling the callback.
+        """
+        if not 0 < failure_rate <= 1:
+            raise ValueError("failure_rate must be in (0, 1]")
+        self.failure_rate = failure_rate
+        self.min_calls = min(min_calls, window)
+        self.open_timeout = open_timeout
+        self.half_open_probes = half_open_probes
+        self.pause = pause
+        self.opened = 0
+        self.rejected = 0
+        self._state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self.remaining <= 0:
+            return HALF_OPEN
+        return self._state
+
+    @property
+    def remaining(self) -> float:
+        """
+        Seconds until an open breaker turns half-open.
+        """
+        if self._state != OPEN:
+            return 0.0
+        return max(self._opened_at + self.open_timeout - time.monotonic(), 0.0)
+
+    @property
+    def failure_ratio(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def allow(self) -> bool:
+        """
+        Returns whether a call may go through, reserving a probe slot when
+        half-open. Every allowed call must be followed by one of
+        `record_success`, `record_failure` or `release`.
+        """
+        if self._state == OPEN and self.remaining <= 0:
+            self._state = HALF_OPEN
+            self._probes = self._probe_successes = 0
+        if self._state == OPEN or (self._state == HALF_OPEN and self._probes >= self.half_open_probes):
+            self.rejected += 1
+            return False
+        if self._state == HALF_OPEN:
+            self._probes += 1
+        return True
+
+    def record_success(self) -> None:
+        if self._state == HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._state = CLOSED
+                self._outcomes.clear()
+            return
+        self._outcomes.append(True)
+
+    def record_failure(self) -> bool:
+        """
+        Records a failed call. Returns True if this failure opened the breaker.
+        """
+        if self._state == HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+            self._open()
+            return True
+        if self._state == OPEN:
+            return False
+        self._outcomes.append(False)
+        if len(self._outcomes) >= self.min_calls and self.failure_ratio >= self.failure_rate:
+            self._open()
+            return True
+        return False
+
+    def release(self) -> None:
+        """
+        Ends an allowed call without counting it, e.g. for a malformed
+        message that says nothing about the dependency's health.
+        """
+        if self._state == HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.opened += 1
+
+    def stats(self) -> Dict[str, Union[str, int, float]]:
+        return {
+            "breaker_state": self.state,
+            "breaker_failure_ratio": round(self.failure_ratio, 3),
+            "breaker_opened": self.opened,
+            "breaker_rejected": self.rejected,
+        }
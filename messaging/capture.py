@@ -0,0 +1,128 @@
+import asyncio
+import base64
+import json
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import aio_pika
+
+from app.utils.messaging.codecs import CodecRegistry, default_codecs
+
+
+class TrafficRecorder:
+    """
+    Appends every delivered message to a JSONL file: headers, body, routing
+    and timing, for offline replay with TrafficReplayer.
+    """
+
+    def __init__(self, path: str, flush_every: int = 100):
+        self.path = path
+        self.flush_every = flush_every
+        self.recorded = 0
+        self._file = open(path, "a", encoding="utf-8")
+        self._started = time.monotonic()
+
+    def record(self, message: aio_pika.IncomingMessage, queue_name: str, received_at: float,
+               duration: float, outcome: str) -> None:
+        """
+        Writes one delivery. `received_at` is a `time.monotonic()` reading and
+        `duration` the handling time in seconds.
+        """
+        try:
+            body, body_encoding = message.body.decode("utf-8"), "utf-8"
+        except UnicodeDecodeError:
+            body, body_encoding = base64.b64encode(message.body).decode("ascii"), "base64"
+        entry = {
+            "offset_s": round(received_at - self._started, 6),
+            "captured_at": time.time(),
+            "queue": queue_name,
+            "exchange": message.exchange,
+            "routing_key": message.routing_key,
+            "redelivered": message.redelivered,
+            "content_type": message.content_type,
+            "headers": message.headers or {},
+            "body": body,
+            "body_encoding": body_encoding,
+            "duration_ms": round(duration * 1000, 3),
+            "outcome": outcome,
+        }
+        self._file.write(json.dumps(entry, default=str) + "\n")
+        self.recorded += 1
+        if self.recorded % self.flush_every == 0:
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class CapturedMessage:
+    """
+    A recorded delivery read back from a capture file.
+    """
+
+    def __init__(self, entry: Dict[str, Any]):
+        self.entry = entry
+        self.queue: str = entry.get("queue", "")
+        self.offset_s: float = entry.get("offset_s", 0.0)
+        self.headers: Dict[str, Any] = entry.get("headers") or {}
+        self.content_type: Optional[str] = entry.get("content_type")
+        if entry.get("body_encoding") == "base64":
+            self.body = base64.b64decode(entry["body"])
+        else:
+            self.body = entry.get("body", "").encode("utf-8")
+
+
+def read_capture(path: str) -> Iterator[CapturedMessage]:
+    with open(path, encoding="utf-8") as capture:
+        for line in capture:
+            if line.strip():
+                yield CapturedMessage(json.loads(line))
+
+
+class TrafficReplayer:
+    """
+    Feeds captured messages to callbacks offline, as fast as possible
+    (`speed=0`) or paced like the original traffic (`speed=1.0` is real
+    time, `2.0` twice as fast).
+
+    `callbacks` maps queue names to `callback(message_data, request_id)`
+    coroutines; a `"*"` entry handles every queue without its own callback.
+    """
+
+    def __init__(self, callbacks: Dict[str, Callable], speed: float = 0.0,
+                 codecs: Optional[CodecRegistry] = None):
+        self.callbacks = callbacks
+        self.speed = speed
+        self.codecs = codecs or default_codecs()
+
+    async def replay(self, path: str) -> Dict[str, Any]:
+        """
+        Replays a capture file and returns counts, elapsed time and throughput.
+        """
+        summary = {"replayed": 0, "skipped": 0, "failed": 0}
+        started = time.monotonic()
+        first_offset = None
+        for captured in read_capture(path):
+            callback = self.callbacks.get(captured.queue, self.callbacks.get("*"))
+            if callback is None:
+                summary["skipped"] += 1
+                continue
+            if self.speed:
+                if first_offset is None:
+                    first_offset = captured.offset_s
+                delay = (captured.offset_s - first_offset) / self.speed - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            try:
+                await callback(
+                    self.codecs.decode(captured.body, captured.content_type),
+                    captured.headers.get("request_id"),
+                )
+                summary["replayed"] += 1
+            except Exception:
+                summary["failed"] += 1
+
+        elapsed = time.monotonic() - started
+        summary["elapsed_s"] = round(elapsed, 3)
+        summary["throughput"] = round(summary["replayed"] / elapsed, 1) if elapsed else 0.0
+        return summary
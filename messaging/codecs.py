@@ -0,0 +1,111 @@
+import json
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional binary format
+    msgpack = None
+
+
+DEFAULT_CONTENT_TYPE = "application/json"
+
+
+class Codec:
+    """
+    Decodes and encodes message bodies for one content type.
+    """
+
+    def __init__(self, name: str, decode: Callable[[bytes], Any], encode: Callable[[Any], bytes]):
+        self.name = name
+        self._decode = decode
+        self._encode = encode
+
+    def decode(self, body: bytes) -> Any:
+        """
+        Decodes a message body, raising ValueError on malformed input.
+        """
+        try:
+            return self._decode(body)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"{self.name} decode failed: {e}") from e
+
+    def encode(self, data: Any) -> bytes:
+        return self._encode(data)
+
+
+def _stdlib_json_encode(data: Any) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def json_codec() -> Codec:
+    """
+    Returns the fastest available JSON codec. orjson parses straight from the
+    bytes buffer; the stdlib fallback also accepts bytes without an explicit
+    decode step.
+    """
+    if orjson is not None:
+        return Codec("orjson", orjson.loads, orjson.dumps)
+    return Codec("json", json.loads, _stdlib_json_encode)
+
+
+def msgpack_codec() -> Codec:
+    """
+    Returns a msgpack codec. Requires the `msgpack` package.
+    """
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return Codec(
+        "msgpack",
+        lambda body: msgpack.unpackb(body, raw=False),
+        lambda data: msgpack.packb(data, use_bin_type=True),
+    )
+
+
+class CodecRegistry:
+    """
+    Selects a codec from a message's `content_type`.
+    """
+
+    def __init__(self, default_content_type: str = DEFAULT_CONTENT_TYPE):
+        self.default_content_type = default_content_type
+        self._codecs: Dict[str, Codec] = {}
+
+    def register(self, content_type: str, codec: Codec) -> None:
+        self._codecs[content_type.lower()] = codec
+
+    def get(self, content_type: Optional[str]) -> Codec:
+        """
+        Returns the codec for a content type, ignoring parameters such as
+        `charset`. Messages without a content type use the default.
+        """
+        key = (content_type or self.default_content_type).split(";", 1)[0].strip().lower()
+        try:
+            return self._codecs[key]
+        except KeyError:
+            raise ValueError(f"Unsupported content type: {content_type}")
+
+    def decode(self, body: bytes, content_type: Optional[str] = None) -> Any:
+        return self.get(content_type).decode(body)
+
+    def encode(self, data: Any, content_type: Optional[str] = None) -> bytes:
+        return self.get(content_type).encode(data)
+
+
+def default_codecs() -> CodecRegistry:
+    """
+    Builds a registry with JSON and, when installed, msgpack codecs.
+    """
+    registry = CodecRegistry()
+    registry.register("application/json", json_codec())
+    if msgpack is not None:
+        codec = msgpack_codec()
+        registry.register("application/msgpack", codec)
+        registry.register("application/x-msgpack", codec)
+    return registry
@@ -0,0 +1,11 @@
+import aio_pika
+
+
+class AMQPConnector:
+    """
+    Opens AMQP connections. Bound through `inject` so tests and benchmarks
+    can substitute an in-memory broker (see `messaging.fake_broker`).
+    """
+
+    async def connect(self, url: str) -> aio_pika.abc.AbstractRobustConnection:
+        return await aio_pika.connect_robust(url)
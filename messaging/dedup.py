@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+
+class LRUDedupCache:
+    """
+    Bounded in-process record of completed request ids with a TTL.
+    """
+
+    def __init__(self, max_size: int = 100_000, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def contains(self, key: Hashable) -> bool:
+        expires_at = self._entries.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False
+        self._entries.move_to_end(key)
+        return True
+
+    def add(self, key: Hashable) -> None:
+        self._entries[key] = time.monotonic() + self.ttl
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisDedupStore:
+    """
+    Shared record of completed request ids, stored as expiring Redis keys
+    namespaced by consumer group: `<prefix>:<group>:<request_id>`.
+    """
+
+    def __init__(self, ttl: int = 3600, prefix: str = "dedup", redis_location: Optional[str] = None):
+        self.ttl = ttl
+        self.prefix = prefix
+        self.redis_location = redis_location or settings.REDIS_LOCATION
+        self.redis_connection: Optional[aioredis.Redis] = None
+
+    async def connect(self) -> None:
+        """
+        Establishes a connection to Redis.
+        """
+        self.redis_connection = aioredis.Redis.from_url(self.redis_location)
+
+    def _key(self, group: str, request_id: str) -> str:
+        return f"{self.prefix}:{group}:{request_id}"
+
+    async def contains(self, group: str, request_id: str) -> bool:
+        return bool(await self.redis_connection.exists(self._key(group, request_id)))
+
+    async def add(self, group: str, request_id: str) -> None:
+        await self.redis_connection.set(self._key(group, request_id), 1, ex=self.ttl)
+
+    async def close(self) -> None:
+        if self.redis_connection is not None:
+            await self.redis_connection.close()
+
+
+class Deduplicator:
+    """
+    Skips messages whose `request_id` has already been processed by the same
+    consumer group, i.e. the same queue. Every queue bound to a fanout
+    exchange gets its own copy of an event, so one queue processing it says
+    nothing about the others.
+
+    Checks the local LRU first and only then the optional shared Redis store,
+    so repeated ids seen by this process never cost a round trip.
+    """
+
+    def __init__(self, local: Optional[LRUDedupCache] = None, shared: Optional[RedisDedupStore] = None):
+        self.local = local or LRUDedupCache()
+        self.shared = shared
+        self.skipped = 0
+
+    async def connect(self) -> None:
+        if self.shared is not None:
+            await self.shared.connect()
+
+    async def is_done(self, group: str, request_id: str) -> bool:
+        if self.local.contains((group, request_id)):
+            self.skipped += 1
+            return True
+        if self.shared is not None and await self.shared.contains(group, request_id):
+            self.local.add((group, request_id))
+            self.skipped += 1
+            return True
+        return False
+
+    async def mark_done(self, group: str, request_id: str) -> None:
+        self.local.add((group, request_id))
+        if self.shared is not None:
+            await self.shared.add(group, request_id)
+
+    async def close(self) -> None:
+        if self.shared is not None:
+            await self.shared.close()
+
+    def stats(self):
+        return {"cached": len(self.local), "skipped": self.skipped}
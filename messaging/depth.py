@@ -0,0 +1,133 @@
+import time
+from typing import Dict, Optional, Union
+
+from app.utils.messaging.pool import HandlerPool
+
+
+class QueueDepth:
+    """
+    Broker-side depth of a queue, sampled with passive declares, and the
+    arrival and drain rates derived from consecutive samples.
+
+    The arrival rate is the change in backlog plus what the local pool took
+    in since the last sample; the drain rate is what the local pool took in.
+    Both are smoothed with a moving average weighted by `smoothing`.
+    """
+
+    def __init__(self, name: str, max_length: Optional[int] = None, smoothing: float = 0.3):
+        self.name = name
+        self.max_length = max_length
+        self.smoothing = smoothing
+        self.backlog = 0
+        self.consumers = 0
+        self.arrival_rate = 0.0
+        self.drain_rate = 0.0
+        self.samples = 0
+        self._delivered = 0
+        self._sampled_at: Optional[float] = None
+
+    def update(self, message_count: int, consumer_count: int, delivered: int,
+               now: Optional[float] = None) -> None:
+        """
+        Records a sample. `delivered` is the running count of deliveries the
+        local pool has taken in (processed, running or waiting for a slot).
+        """
+        now = time.monotonic() if now is None else now
+        if self._sampled_at is not None and now > self._sampled_at:
+            elapsed = now - self._sampled_at
+            taken = max(delivered - self._delivered, 0)
+            arrival_rate = max(message_count - self.backlog + taken, 0) / elapsed
+            drain_rate = taken / elapsed
+            if self.samples > 1:
+                arrival_rate = self.arrival_rate + self.smoothing * (arrival_rate - self.arrival_rate)
+                drain_rate = self.drain_rate + self.smoothing * (drain_rate - self.drain_rate)
+            self.arrival_rate, self.drain_rate = arrival_rate, drain_rate
+        self.backlog = message_count
+        self.consumers = consumer_count
+        self._delivered = delivered
+        self._sampled_at = now
+        self.samples += 1
+
+    @property
+    def drain_time(self) -> Optional[float]:
+        """
+        Seconds until the backlog is cleared at current rates, or None if it
+        is not shrinking.
+        """
+        if not self.backlog:
+            return 0.0
+        if self.drain_rate <= self.arrival_rate:
+            return None
+        return self.backlog / (self.drain_rate - self.arrival_rate)
+
+    @property
+    def time_to_full(self) -> Optional[float]:
+        """
+        Seconds until the backlog reaches `max_length` and the broker starts
+        dropping or rejecting messages, or None if it is not growing.
+        """
+        if self.max_length is None or self.arrival_rate <= self.drain_rate:
+            return None
+        return max(self.max_length - self.backlog, 0) / (self.arrival_rate - self.drain_rate)
+
+    def stats(self) -> Dict[str, Union[int, float, None]]:
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value, 3)
+
+        return {
+            "backlog": self.backlog,
+            "consumers": self.consumers,
+            "fill_ratio": rounded(self.backlog / self.max_length) if self.max_length else None,
+            "arrival_rate": rounded(self.arrival_rate),
+            "drain_rate": rounded(self.drain_rate),
+            "drain_time_s": rounded(self.drain_time),
+            "time_to_full_s": rounded(self.time_to_full),
+        }
+
+
+class QueueDepthMonitor:
+    """
+    Decides a queue's handler pool size from its sampled depth.
+
+    Without `max_pool_size` queues are only sampled for metrics. With it,
+    a pool that is fully busy while the backlog would take longer than
+    `target_drain_time` to clear (or is growing) gains `step` slots, and a
+    pool with an empty backlog and under half its slots busy loses `step`,
+    staying within `min_pool_size` and `max_pool_size`.
+    """
+
+    def __init__(
+        self,
+        interval: float = 5.0,
+        smoothing: float = 0.3,
+        min_pool_size: int = 1,
+        max_pool_size: Optional[int] = None,
+        target_drain_time: float = 30.0,
+        step: int = 2,
+    ):
+        """
+        `interval` (how often queues are sampled) and `target_drain_time`
+        are in seconds.
+        """
+        if max_pool_size is not None and max_pool_size < min_pool_size:
+            raise ValueError("max_pool_size must be at least min_pool_size")
+        self.interval = interval
+        self.smoothing = smoothing
+        self.min_pool_size = min_pool_size
+        self.max_pool_size = max_pool_size
+        self.target_drain_time = target_drain_time
+        self.step = step
+
+    def evaluate(self, depth: QueueDepth, pool: HandlerPool) -> int:
+        """
+        Returns the handler pool size the queue should have.
+        """
+        if self.max_pool_size is None:
+            return pool.size
+        drain_time = depth.drain_time
+        behind = depth.backlog > 0 and (drain_time is None or drain_time > self.target_drain_time)
+        if behind and pool.in_flight >= pool.size:
+            return min(self.max_pool_size, pool.size + self.step)
+        if depth.backlog == 0 and pool.in_flight < pool.size / 2:
+            return max(self.min_pool_size, pool.size - self.step)
+        return pool.size
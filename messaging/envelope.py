@@ -0,0 +1,45 @@
+from typing import Any, Callable, Dict, Optional
+
+import aio_pika
+
+from app.utils.messaging.schemas import EVENT_TYPE_HEADER
+
+_UNDECODED = object()
+
+
+class MessageEnvelope:
+    """
+    A delivery whose headers are available immediately and whose body is
+    decoded and validated only on first access to `data`.
+
+    Decode or validation failures raise InvalidMessageError from `data`, so
+    they follow the usual failure path of the callback that touched it.
+    """
+
+    __slots__ = ("message", "headers", "request_id", "event_type", "_decode", "_data")
+
+    def __init__(self, message: aio_pika.IncomingMessage, request_id: str,
+                 decode: Callable[[aio_pika.IncomingMessage], Any]):
+        self.message = message
+        self.headers: Dict[str, Any] = message.headers or {}
+        self.request_id = request_id
+        self.event_type: Optional[str] = self.headers.get(EVENT_TYPE_HEADER)
+        self._decode = decode
+        self._data = _UNDECODED
+
+    @property
+    def data(self) -> Any:
+        if self._data is _UNDECODED:
+            self._data = self._decode(self.message)
+        return self._data
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._data is not _UNDECODED
+
+    @property
+    def body(self) -> bytes:
+        """
+        The raw, undecoded body.
+        """
+        return self.message.body
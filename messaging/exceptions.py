@@ -0,0 +1,6 @@
+class InvalidMessageError(ValueError):
+    """Raised when a message body cannot be decoded or fails schema validation."""
+
+
+class ThrottledError(Exception):
+    """Raised by callbacks when a downstream dependency asks to back off."""
@@ -0,0 +1,583 @@
+import asyncio
+import itertools
+import zlib
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import aio_pika
+from aio_pika.exceptions import (
+    ChannelNotFoundEntity,
+    ChannelPreconditionFailed,
+    DeliveryError,
+)
+
+from app.utils.messaging.connector import AMQPConnector
+
+
+class _Envelope:
+    """
+    A published message as stored by the broker.
+    """
+
+    def __init__(self, message: aio_pika.Message, exchange: str, routing_key: str):
+        self.body = message.body
+        self.headers = dict(message.headers or {})
+        self.content_type = message.content_type
+        self.content_encoding = message.content_encoding
+        self.message_id = message.message_id
+        self.correlation_id = message.correlation_id
+        self.user_id = message.user_id
+        self.timestamp = message.timestamp
+        self.delivery_mode = message.delivery_mode
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.published_at = datetime.now(timezone.utc)
+
+    def copy(self, exchange: str, routing_key: str, headers: Dict[str, Any]) -> "_Envelope":
+        envelope = object.__new__(_Envelope)
+        envelope.__dict__.update(self.__dict__)
+        envelope.exchange = exchange
+        envelope.routing_key = routing_key
+        envelope.headers = headers
+        return envelope
+
+
+class FakeIncomingMessage:
+    """
+    The subset of `aio_pika.IncomingMessage` used by EventSubscriber.
+    """
+
+    def __init__(self, channel: "FakeChannel", envelope: _Envelope, delivery_tag: int,
+                 redelivered: bool = False, consumer_tag: Optional[str] = None,
+                 extra_headers: Optional[Dict[str, Any]] = None):
+        self.channel = channel
+        self.body = envelope.body
+        self.headers = {**envelope.headers, **(extra_headers or {})}
+        self.content_type = envelope.content_type
+        self.content_encoding = envelope.content_encoding
+        self.message_id = envelope.message_id
+        self.correlation_id = envelope.correlation_id
+        self.user_id = envelope.user_id
+        self.timestamp = envelope.timestamp
+        self.delivery_mode = envelope.delivery_mode
+        self.exchange = envelope.exchange
+        self.routing_key = envelope.routing_key
+        self.delivery_tag = delivery_tag
+        self.redelivered = redelivered
+        self.consumer_tag = consumer_tag
+        self.processed = False
+
+    async def ack(self, multiple: bool = False) -> None:
+        self.processed = True
+        self.channel._settle(self.delivery_tag, multiple, requeue=None)
+
+    async def nack(self, multiple: bool = False, requeue: bool = True) -> None:
+        self.processed = True
+        self.channel._settle(self.delivery_tag, multiple, requeue=requeue)
+
+    async def reject(self, requeue: bool = False) -> None:
+        self.processed = True
+        self.channel._settle(self.delivery_tag, False, requeue=requeue)
+
+    @asynccontextmanager
+    async def process(self, requeue: bool = False, reject_on_redelivered: bool = False,
+                      ignore_processed: bool = False):
+        try:
+            yield self
+        except BaseException:
+            if not (ignore_processed and self.processed):
+                await self.reject(requeue=requeue and not (reject_on_redelivered and self.redelivered))
+            raise
+        else:
+            if not (ignore_processed and self.processed):
+                await self.ack()
+
+
+class _Consumer:
+    def __init__(self, tag: str, callback: Callable, channel: "FakeChannel", no_ack: bool,
+                 position: Optional[int] = None):
+        self.tag = tag
+        self.callback = callback
+        self.channel = channel
+        self.prefetch_count = channel.prefetch_count
+        self.no_ack = no_ack
+        self.unacked = 0
+        self.position = position
+
+    @property
+    def has_capacity(self) -> bool:
+        return not self.prefetch_count or self.unacked < self.prefetch_count
+
+
+class FakeExchange:
+    def __init__(self, broker: "FakeBroker", name: str, exchange_type: str, arguments: Optional[dict]):
+        self.broker = broker
+        self.name = name
+        self.type = exchange_type
+        self.arguments = arguments or {}
+        # Destinations are queues or, for exchange-to-exchange bindings, exchanges.
+        self.bindings: List[Tuple[Any, str, dict]] = []
+
+    async def publish(self, message: aio_pika.Message, routing_key: str = "", **_: Any):
+        if not self.broker._publish(self.name, routing_key, _Envelope(message, self.name, routing_key)):
+            raise DeliveryError(None, None)
+
+    async def bind(self, exchange, routing_key: str = "", arguments: Optional[dict] = None, **_: Any):
+        source = self.broker._exchange(getattr(exchange, "name", exchange))
+        source.bindings.append((self, routing_key, arguments or {}))
+
+    async def unbind(self, exchange, routing_key: str = "", **_: Any):
+        source = self.broker._exchange(getattr(exchange, "name", exchange))
+        source.bindings = [
+            binding for binding in source.bindings
+            if not (binding[0] is self and binding[1] == routing_key)
+        ]
+
+    def route(self, routing_key: str, headers: Optional[Dict[str, Any]] = None) -> List[Any]:
+        if self.type == "fanout":
+            return [destination for destination, _, _ in self.bindings]
+        if self.type == "direct":
+            return [destination for destination, key, _ in self.bindings if key == routing_key]
+        if self.type == "topic":
+            return [destination for destination, key, _ in self.bindings if _topic_matches(key, routing_key)]
+        if self.type == "headers":
+            return [
+                destination for destination, _, arguments in self.bindings
+                if _headers_match(arguments, headers or {})
+            ]
+        if self.type == "x-consistent-hash":
+            hash_header = self.arguments.get("hash-header")
+            if hash_header is not None:
+                routing_key = str((headers or {}).get(hash_header, ""))
+            return _consistent_hash_route(self.bindings, routing_key)
+        raise NotImplementedError(f"FakeBroker does not route {self.type} exchanges")
+
+
+def _topic_matches(pattern: str, routing_key: str) -> bool:
+    def match(words: List[str], keys: List[str]) -> bool:
+        if not words:
+            return not keys
+        if words[0] == "#":
+            return any(match(words[1:], keys[index:]) for index in range(len(keys) + 1))
+        if not keys:
+            return False
+        return words[0] in ("*", keys[0]) and match(words[1:], keys[1:])
+
+    return match(pattern.split("."), routing_key.split(".") if routing_key else [])
+
+
+def _headers_match(arguments: dict, headers: Dict[str, Any]) -> bool:
+    expected = {key: value for key, value in arguments.items() if not key.startswith("x-")}
+    matches = [headers.get(key) == value for key, value in expected.items()]
+    return any(matches) if arguments.get("x-match") == "any" else all(matches)
+
+
+def _consistent_hash_route(bindings: List[Tuple[Any, str, dict]], routing_key: str) -> List[Any]:
+    if not bindings:
+        return []
+    slots = [queue for queue, weight, _ in bindings for _ in range(int(weight or 1))]
+    return [slots[zlib.crc32(routing_key.encode("utf-8")) % len(slots)]]
+
+
+class _QueueState:
+    def __init__(self, broker: "FakeBroker", name: str, durable: bool, arguments: Optional[dict]):
+        self.broker = broker
+        self.name = name
+        self.durable = durable
+        self.arguments = arguments or {}
+        self.ready: Deque[Tuple[_Envelope, bool]] = deque()
+        self.log: List[_Envelope] = []
+        self.consumers: "OrderedDict[str, _Consumer]" = OrderedDict()
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+
+    @property
+    def is_stream(self) -> bool:
+        return self.arguments.get("x-queue-type") == "stream"
+
+    @property
+    def single_active_consumer(self) -> bool:
+        return bool(self.arguments.get("x-single-active-consumer"))
+
+    @property
+    def message_count(self) -> int:
+        return len(self.ready)
+
+    def _pop(self) -> Tuple[_Envelope, bool]:
+        envelope, redelivered = self.ready.popleft()
+        timer = self._timers.pop(id(envelope), None)
+        if timer is not None:
+            timer.cancel()
+        return envelope, redelivered
+
+    def _stream_position(self, offset) -> int:
+        if offset == "first":
+            return 0
+        if offset == "last":
+            return max(len(self.log) - 1, 0)
+        if offset == "next":
+            return len(self.log)
+        if isinstance(offset, datetime):
+            for position, envelope in enumerate(self.log):
+                if envelope.published_at >= offset:
+                    return position
+            return len(self.log)
+        return int(offset)
+
+
+class FakeQueue:
+    """
+    A queue as seen from one channel, like `aio_pika.Queue`.
+    """
+
+    def __init__(self, state: _QueueState, channel: "FakeChannel"):
+        self.state = state
+        self.channel = channel
+        self.broker = state.broker
+        self.name = state.name
+        self.durable = state.durable
+        self.arguments = state.arguments
+        self.declaration_result = SimpleNamespace(
+            message_count=state.message_count, consumer_count=len(state.consumers)
+        )
+
+    async def bind(self, exchange, routing_key: str = "", arguments: Optional[dict] = None, **_: Any):
+        exchange = self.broker._exchange(getattr(exchange, "name", exchange))
+        exchange.bindings.append((self.state, routing_key, arguments or {}))
+
+    async def unbind(self, exchange, routing_key: str = "", **_: Any):
+        exchange = self.broker._exchange(getattr(exchange, "name", exchange))
+        exchange.bindings = [
+            binding for binding in exchange.bindings
+            if not (binding[0] is self.state and binding[1] == routing_key)
+        ]
+
+    async def consume(self, callback: Callable, no_ack: bool = False, arguments: Optional[dict] = None,
+                      consumer_tag: Optional[str] = None, **_: Any) -> str:
+        state = self.state
+        tag = consumer_tag or f"ctag-{next(self.broker._tags)}"
+        position = None
+        if state.is_stream:
+            position = state._stream_position((arguments or {}).get("x-stream-offset", "next"))
+        state.consumers[tag] = _Consumer(tag, callback, self.channel, no_ack, position)
+        self.broker._dispatch(state)
+        return tag
+
+    async def cancel(self, consumer_tag: str, **_: Any) -> None:
+        self.state.consumers.pop(consumer_tag, None)
+        self.broker._dispatch(self.state)
+
+    async def get(self, no_ack: bool = False, fail: bool = True, **_: Any) -> Optional[FakeIncomingMessage]:
+        if not self.state.ready:
+            if fail:
+                raise aio_pika.exceptions.QueueEmpty()
+            return None
+        envelope, redelivered = self.state._pop()
+        return self.channel._deliver(self.state, envelope, redelivered, None, no_ack)
+
+    async def purge(self, **_: Any):
+        count = len(self.state.ready)
+        while self.state.ready:
+            self.state._pop()
+        return SimpleNamespace(message_count=count)
+
+
+class FakeChannel:
+    def __init__(self, connection: "FakeConnection", publisher_confirms: bool):
+        self.connection = connection
+        self.broker = connection.broker
+        self.publisher_confirms = publisher_confirms
+        self.prefetch_count = 0
+        self.is_closed = False
+        self._tags = itertools.count(1)
+        self._unacked: "OrderedDict[int, Tuple[_QueueState, _Envelope, Optional[_Consumer]]]" = OrderedDict()
+
+    async def set_qos(self, prefetch_count: int = 0, prefetch_size: int = 0, global_: bool = False, **_: Any):
+        self.prefetch_count = prefetch_count
+
+    async def declare_exchange(self, name: str, type="direct", durable: bool = False,
+                               passive: bool = False, arguments: Optional[dict] = None, **_: Any) -> FakeExchange:
+        return self.broker._declare_exchange(name, getattr(type, "value", type), passive, arguments)
+
+    async def get_exchange(self, name: str, ensure: bool = True) -> FakeExchange:
+        return self.broker._exchange(name)
+
+    async def declare_queue(self, name: Optional[str] = None, durable: bool = False, exclusive: bool = False,
+                            passive: bool = False, auto_delete: bool = False,
+                            arguments: Optional[dict] = None, **_: Any) -> FakeQueue:
+        return FakeQueue(self.broker._declare_queue(name, durable, passive, arguments), self)
+
+    async def get_queue(self, name: str, ensure: bool = True) -> FakeQueue:
+        return await self.declare_queue(name, passive=True)
+
+    def _deliver(self, queue: _QueueState, envelope: _Envelope, redelivered: bool,
+                 consumer: Optional[_Consumer], no_ack: bool,
+                 extra_headers: Optional[Dict[str, Any]] = None) -> FakeIncomingMessage:
+        tag = next(self._tags)
+        message = FakeIncomingMessage(
+            self, envelope, tag, redelivered, consumer.tag if consumer else None, extra_headers
+        )
+        if not no_ack:
+            self._unacked[tag] = (queue, envelope, consumer)
+            if consumer is not None:
+                consumer.unacked += 1
+        return message
+
+    def _settle(self, delivery_tag: int, multiple: bool, requeue: Optional[bool]):
+        if delivery_tag not in self._unacked:
+            raise ChannelPreconditionFailed(f"unknown delivery tag {delivery_tag}")
+        tags = [tag for tag in self._unacked if tag <= delivery_tag] if multiple else [delivery_tag]
+        touched = set()
+        requeued = []
+        for tag in tags:
+            queue, envelope, consumer = self._unacked.pop(tag)
+            if consumer is not None:
+                consumer.unacked -= 1
+            touched.add(queue)
+            if queue.is_stream or requeue is None:
+                continue
+            if requeue:
+                requeued.append((queue, envelope))
+            else:
+                self.broker._dead_letter(queue, envelope, "rejected")
+        for queue, envelope in reversed(requeued):
+            queue.ready.appendleft((envelope, True))
+        for queue in touched:
+            self.broker._dispatch(queue)
+
+    async def close(self, *_: Any):
+        if self.is_closed:
+            return
+        self.is_closed = True
+        for queue in self.broker.queues.values():
+            for tag, consumer in list(queue.consumers.items()):
+                if consumer.channel is self:
+                    del queue.consumers[tag]
+        if self._unacked:
+            self._settle(next(reversed(self._unacked)), True, requeue=True)
+
+
+class FakeConnection:
+    def __init__(self, broker: "FakeBroker", url: str):
+        self.broker = broker
+        self.url = url
+        self.channels: List[FakeChannel] = []
+        self.is_closed = False
+
+    async def channel(self, publisher_confirms: bool = True, **_: Any) -> FakeChannel:
+        channel = FakeChannel(self, publisher_confirms)
+        self.channels.append(channel)
+        return channel
+
+    async def close(self, *_: Any):
+        for channel in self.channels:
+            await channel.close()
+        self.is_closed = True
+
+
+class FakeBroker(AMQPConnector):
+    """
+    An in-process stand-in for RabbitMQ implementing the parts of the
+    aio_pika API that EventSubscriber and EventPublisher use: exchanges
+    (fanout, direct, topic, headers, consistent-hash, and the default
+    exchange), exchange-to-exchange bindings, alternate exchanges, classic
+    and stream queues, single active consumer, prefetch, acks, basic.get,
+    per-queue TTL, max-length overflow and dead-lettering with `x-death`
+    headers.
+
+    Bind it in place of the real connector to run consumers without a
+    network:
+
+        broker = FakeBroker()
+        inject.configure(lambda binder: binder.bind(AMQPConnector, broker))
+
+    `ttl_scale` multiplies every queue TTL, so retry tiers of seconds can
+    expire in milliseconds. Exceptions escaping consumer callbacks are kept
+    in `errors` instead of being logged.
+    """
+
+    def __init__(self, ttl_scale: float = 1.0):
+        self.ttl_scale = ttl_scale
+        self.exchanges: Dict[str, FakeExchange] = {"": FakeExchange(self, "", "direct", None)}
+        self.queues: Dict[str, _QueueState] = {}
+        self.connections: List[FakeConnection] = []
+        self.errors: List[BaseException] = []
+        self.published = 0
+        self.dead_lettered = 0
+        self._tags = itertools.count(1)
+        self._tasks: set = set()
+
+    async def connect(self, url: str = "amqp://fake/") -> FakeConnection:
+        connection = FakeConnection(self, url)
+        self.connections.append(connection)
+        return connection
+
+    async def settle(self) -> None:
+        """
+        Waits until every delivered callback has finished running.
+        """
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def _exchange(self, name: str) -> FakeExchange:
+        try:
+            return self.exchanges[name]
+        except KeyError:
+            raise ChannelNotFoundEntity(f"no exchange '{name}'")
+
+    def _declare_exchange(self, name: str, exchange_type: str, passive: bool, arguments: Optional[dict]):
+        exchange = self.exchanges.get(name)
+        if exchange is None:
+            if passive:
+                raise ChannelNotFoundEntity(f"no exchange '{name}'")
+            exchange = self.exchanges[name] = FakeExchange(self, name, exchange_type, arguments)
+        elif not passive and exchange.type != exchange_type:
+            raise ChannelPreconditionFailed(f"exchange '{name}' declared with type {exchange.type}")
+        return exchange
+
+    def _declare_queue(self, name: Optional[str], durable: bool, passive: bool, arguments: Optional[dict]):
+        name = name or f"amq.gen-{next(self._tags)}"
+        queue = self.queues.get(name)
+        if queue is None:
+            if passive:
+                raise ChannelNotFoundEntity(f"no queue '{name}'")
+            queue = self.queues[name] = _QueueState(self, name, durable, arguments)
+        elif not passive and arguments is not None and queue.arguments != arguments:
+            raise ChannelPreconditionFailed(f"queue '{name}' declared with different arguments")
+        return queue
+
+    def _publish(self, exchange_name: str, routing_key: str, envelope: _Envelope) -> bool:
+        self.published += 1
+        if exchange_name == "":
+            queues = [self.queues[routing_key]] if routing_key in self.queues else []
+        else:
+            queues = self._route(self._exchange(exchange_name), routing_key, envelope.headers, set())
+        accepted = True
+        for queue in queues:
+            accepted = self._enqueue(queue, envelope) and accepted
+        return accepted
+
+    def _route(self, exchange: FakeExchange, routing_key: str, headers: Dict[str, Any],
+               visited: set) -> List[_QueueState]:
+        visited.add(exchange.name)
+        destinations = exchange.route(routing_key, headers)
+        alternate = self.exchanges.get(exchange.arguments.get("alternate-exchange"))
+        if not destinations and alternate is not None and alternate.name not in visited:
+            destinations = [alternate]
+        queues = []
+        for destination in destinations:
+            if isinstance(destination, FakeExchange):
+                if destination.name not in visited:
+                    queues.extend(self._route(destination, routing_key, headers, visited))
+            elif destination not in queues:
+                queues.append(destination)
+        return queues
+
+    def _enqueue(self, queue: _QueueState, envelope: _Envelope) -> bool:
+        if queue.is_stream:
+            queue.log.append(envelope)
+            self._dispatch(queue)
+            return True
+
+        max_length = queue.arguments.get("x-max-length")
+        max_bytes = queue.arguments.get("x-max-length-bytes")
+        overflow = queue.arguments.get("x-overflow", "drop-head")
+
+        def full() -> bool:
+            if max_length is not None and len(queue.ready) >= max_length:
+                return True
+            return max_bytes is not None and \
+                sum(len(item.body) for item, _ in queue.ready) + len(envelope.body) > max_bytes
+
+        while queue.ready and full():
+            if overflow == "reject-publish":
+                return False
+            if overflow == "reject-publish-dlx":
+                self._dead_letter(queue, envelope, "maxlen")
+                return False
+            dropped, _ = queue._pop()
+            self._dead_letter(queue, dropped, "maxlen")
+
+        queue.ready.append((envelope, False))
+        ttl = queue.arguments.get("x-message-ttl")
+        if ttl is not None:
+            queue._timers[id(envelope)] = asyncio.get_running_loop().call_later(
+                ttl * self.ttl_scale / 1000, self._expire, queue, envelope
+            )
+        self._dispatch(queue)
+        return True
+
+    def _expire(self, queue: _QueueState, envelope: _Envelope):
+        for index, (item, _) in enumerate(queue.ready):
+            if item is envelope:
+                del queue.ready[index]
+                queue._timers.pop(id(envelope), None)
+                self._dead_letter(queue, envelope, "expired")
+                return
+
+    def _dead_letter(self, queue: _QueueState, envelope: _Envelope, reason: str):
+        exchange = queue.arguments.get("x-dead-letter-exchange")
+        if exchange is None:
+            return
+        routing_key = queue.arguments.get("x-dead-letter-routing-key", envelope.routing_key)
+        headers = dict(envelope.headers)
+        deaths = [dict(death) for death in headers.get("x-death", [])]
+        for death in deaths:
+            if death.get("queue") == queue.name and death.get("reason") == reason:
+                death["count"] = death.get("count", 1) + 1
+                deaths.remove(death)
+                deaths.insert(0, death)
+                break
+        else:
+            deaths.insert(0, {
+                "count": 1,
+                "reason": reason,
+                "queue": queue.name,
+                "time": datetime.now(timezone.utc),
+                "exchange": envelope.exchange,
+                "routing-keys": [envelope.routing_key],
+            })
+        headers["x-death"] = deaths
+        self.dead_lettered += 1
+        self._publish(exchange, routing_key, envelope.copy(exchange, routing_key, headers))
+
+    def _dispatch(self, queue: _QueueState):
+        if queue.is_stream:
+            for consumer in queue.consumers.values():
+                while consumer.has_capacity and consumer.position < len(queue.log):
+                    position = consumer.position
+                    consumer.position += 1
+                    message = consumer.channel._deliver(
+                        queue, queue.log[position], False, consumer, consumer.no_ack,
+                        {"x-stream-offset": position},
+                    )
+                    self._run(consumer.callback, message)
+            return
+
+        while queue.ready:
+            if queue.single_active_consumer:
+                # Only the longest-registered consumer receives deliveries.
+                active = next(iter(queue.consumers.values()), None)
+                consumer = active if active is not None and active.has_capacity else None
+            else:
+                consumer = next((c for c in queue.consumers.values() if c.has_capacity), None)
+            if consumer is None:
+                return
+            if not queue.single_active_consumer:
+                # Rotate so the next delivery goes to the following consumer.
+                queue.consumers.move_to_end(consumer.tag)
+            envelope, redelivered = queue._pop()
+            message = consumer.channel._deliver(queue, envelope, redelivered, consumer, consumer.no_ack)
+            self._run(consumer.callback, message)
+
+    def _run(self, callback: Callable, message: FakeIncomingMessage):
+        task = asyncio.get_running_loop().create_task(callback(message))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.errors.append(task.exception())
@@ -0,0 +1,68 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+ASYNC = "async"
+THREAD = "thread"
+PROCESS = "process"
+
+
+class CallbackOffloader:
+    """
+    Runs synchronous, CPU-bound callbacks in managed thread or process pools
+    so they do not block the event loop. Acking stays on the loop; exceptions
+    raised in the pool are re-raised to the awaiting handler unchanged.
+    """
+
+    def __init__(self, thread_workers: Optional[int] = None, process_workers: Optional[int] = None):
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self._executors: Dict[str, Executor] = {}
+
+    def _executor(self, kind: str) -> Executor:
+        executor = self._executors.get(kind)
+        if executor is None:
+            if kind == THREAD:
+                executor = ThreadPoolExecutor(self.thread_workers, thread_name_prefix="event-callback")
+            else:
+                # Forking a process with a running event loop and open broker
+                # connections copies both into the workers.
+                executor = ProcessPoolExecutor(
+                    self.process_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            self._executors[kind] = executor
+        return executor
+
+    def wrap(self, callback: Callable, kind: str = ASYNC) -> Callable:
+        """
+        Returns an async callable running `callback` according to its kind.
+        Process callbacks, and their arguments, must be picklable and
+        importable by a freshly spawned interpreter.
+        """
+        if kind == ASYNC:
+            return callback
+        if kind not in (THREAD, PROCESS):
+            raise ValueError(f"Unknown callback kind: {kind}")
+
+        async def run(*args: Any) -> Any:
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._executor(kind), callback, *args
+                )
+            except BrokenProcessPool:
+                # A crashed worker breaks the whole pool; replace it so the
+                # next message gets a fresh one, and fail this one as usual.
+                self._executors.pop(kind, None)
+                raise
+
+        return run
+
+    async def shutdown(self) -> None:
+        """
+        Waits for running callbacks to finish and stops the pools.
+        """
+        executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            await asyncio.to_thread(executor.shutdown, wait=True)
@@ -0,0 +1,112 @@
+import asyncio
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aio_pika
+
+from app.utils.messaging.codecs import CodecRegistry
+
+PARTITION_KEY = "auction_id"
+
+
+def partition_key(message: aio_pika.IncomingMessage, codecs: CodecRegistry,
+                  field: str = PARTITION_KEY) -> Optional[str]:
+    """
+    Returns the partition key from the headers, falling back to the body.
+    """
+    value = (message.headers or {}).get(field)
+    if value is None:
+        try:
+            body = codecs.decode(message.body, message.content_type)
+        except ValueError:
+            return None
+        if isinstance(body, dict):
+            value = body.get(field)
+    return None if value is None else str(value)
+
+
+class KeyedExecutor:
+    """
+    Runs jobs sharing a key strictly in submission order, while jobs for
+    different keys run in parallel across a fixed number of lanes.
+
+    Keys are hashed onto lanes, so unrelated keys may share a lane; ordering
+    per key is guaranteed, isolation between keys is not.
+    """
+
+    def __init__(self, lanes: int):
+        if lanes < 1:
+            raise ValueError("KeyedExecutor needs at least one lane")
+        self.lanes = lanes
+        self.processed = 0
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        self._unkeyed = 0
+        self._closing = False
+
+    def lane_for(self, key: Optional[str]) -> int:
+        """
+        Returns the lane for a key. Keyless jobs are spread round-robin.
+        """
+        if key is None:
+            self._unkeyed += 1
+            return self._unkeyed % self.lanes
+        return zlib.crc32(key.encode("utf-8")) % self.lanes
+
+    def submit(self, key: Optional[str], job: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """
+        Queues a job on its key's lane and returns a future for its result.
+        Queuing is synchronous, so jobs keep the order of `submit` calls.
+        """
+        if not self._workers:
+            self._start()
+        future = asyncio.get_running_loop().create_future()
+        self._queues[self.lane_for(key)].put_nowait((job, future))
+        return future
+
+    def _start(self):
+        self._queues = [asyncio.Queue() for _ in range(self.lanes)]
+        self._workers = [asyncio.create_task(self._run_lane(queue)) for queue in self._queues]
+
+    async def _run_lane(self, queue: asyncio.Queue):
+        while True:
+            job, future = await queue.get()
+            try:
+                result = await job()
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.processed += 1
+                queue.task_done()
+            # A job may swallow the cancellation (e.g. failing to reject on a
+            # closed channel), so the lane checks for shutdown itself.
+            if self._closing:
+                return
+
+    async def join(self):
+        """
+        Waits until every queued job has finished.
+        """
+        for queue in self._queues:
+            await queue.join()
+
+    async def close(self):
+        """
+        Stops the lane workers. Jobs still queued are abandoned.
+        """
+        self._closing = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "lanes": self.lanes,
+            "pending": sum(queue.qsize() for queue in self._queues),
+            "processed": self.processed,
+        }
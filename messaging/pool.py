@@ -0,0 +1,86 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class HandlerPool:
+    """
+    Bounds the number of message callbacks running concurrently for a queue.
+    """
+
+    def __init__(self, name: str, size: int, latency_smoothing: float = 0.2):
+        """
+        Initializes the pool with a name (usually the queue name) and a size.
+        `latency_smoothing` weights the newest sample in the moving average
+        of callback latency.
+        """
+        if size < 1:
+            raise ValueError("Handler pool size must be at least 1")
+        self.name = name
+        self.size = size
+        self.in_flight = 0
+        self.processed = 0
+        self.waiting = 0
+        self.latency = 0.0
+        self.latency_smoothing = latency_smoothing
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Waits for a free slot and holds it for the duration of the block.
+        """
+        async with self._condition:
+            self.waiting += 1
+            try:
+                await self._condition.wait_for(lambda: self.in_flight < self.size)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self.latency += self.latency_smoothing * (elapsed - self.latency)
+            async with self._condition:
+                self.in_flight -= 1
+                self.processed += 1
+                self._condition.notify_all()
+
+    async def wait_idle(self) -> None:
+        """
+        Waits until no callback is running or waiting for a slot.
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight == 0 and self.waiting == 0)
+
+    async def resize(self, size: int) -> None:
+        """
+        Changes the number of slots. Shrinking lets running callbacks finish;
+        new ones wait until the pool is back under its size.
+        """
+        if size < 1:
+            raise ValueError("Handler pool size must be at least 1")
+        async with self._condition:
+            self.size = size
+            self._condition.notify_all()
+
+    def reset_latency(self, latency: float = 0.0) -> None:
+        """
+        Discards the latency history, e.g. after a paused consumer resumes.
+        """
+        self.latency = latency
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns a snapshot of the pool counters.
+        """
+        return {
+            "size": self.size,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "processed": self.processed,
+            "latency_ms": round(self.latency * 1000, 3),
+        }
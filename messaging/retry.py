@@ -0,0 +1,104 @@
+from typing import Dict, List, Optional, Sequence, Type
+
+from app.utils.messaging.exceptions import InvalidMessageError, ThrottledError
+
+
+class RetryTiers:
+    """
+    Describes the TTL-based delay queues used to schedule retries broker-side.
+
+    Every subscribed queue gets its own set of tier queues. Each has an
+    `x-message-ttl` and no consumers; expired messages are dead-lettered
+    through the default exchange straight back to the queue they came from,
+    so a retry re-enters only that queue's pipeline.
+    """
+
+    def __init__(self, delays: Sequence[int]):
+        """
+        Initializes the tiers with delays in milliseconds.
+        """
+        if not delays:
+            raise ValueError("At least one retry delay is required")
+        self.delays: List[int] = list(delays)
+
+    @classmethod
+    def exponential(cls, max_retries: int, base_ms: int = 1000):
+        """
+        Builds tiers doubling from `2 * base_ms`, mirroring a `2 ** attempt` backoff.
+        """
+        return cls([base_ms * 2 ** attempt for attempt in range(1, max_retries + 1)])
+
+    @staticmethod
+    def queue_name(origin_queue: str, delay: int) -> str:
+        """
+        Returns the tier queue name (and routing key) for an origin queue.
+        """
+        return f"{origin_queue}.retry.{delay}ms"
+
+    def delay_for(self, attempt: int) -> int:
+        """
+        Returns the delay for a 1-based retry attempt, capped at the last tier.
+        """
+        return self.delays[min(max(attempt, 1), len(self.delays)) - 1]
+
+    def routing_key_for(self, origin_queue: str, attempt: int) -> str:
+        """
+        Returns the routing key of the tier that handles a retry attempt.
+        """
+        return self.queue_name(origin_queue, self.delay_for(attempt))
+
+    @staticmethod
+    def queue_arguments(delay: int, origin_queue: str) -> dict:
+        """
+        Returns the declare arguments for a tier queue of `origin_queue`.
+        """
+        return {
+            "x-message-ttl": delay,
+            "x-dead-letter-exchange": "",
+            "x-dead-letter-routing-key": origin_queue,
+        }
+
+
+PERMANENT = "permanent"
+TRANSIENT = "transient"
+THROTTLED = "throttled"
+
+
+class RetryPolicy:
+    """
+    How many times a class of failure is retried, and through which tiers.
+    A policy with no tiers sends failures straight to the dead-letter exchange.
+    """
+
+    def __init__(self, max_retries: int = 0, tiers: Optional[RetryTiers] = None):
+        if max_retries and tiers is None:
+            raise ValueError("A retrying policy needs retry tiers")
+        self.max_retries = max_retries
+        self.tiers = tiers
+
+
+class ErrorClassifier:
+    """
+    Sorts callback and decoding failures into permanent, transient and
+    throttled classes by exception type. The most specific registered type
+    in the exception's MRO wins; anything unregistered uses `default`.
+    """
+
+    def __init__(self, default: str = TRANSIENT):
+        self.default = default
+        self._classes: Dict[Type[BaseException], str] = {
+            InvalidMessageError: PERMANENT,
+            ThrottledError: THROTTLED,
+        }
+
+    def register(self, exception_type: Type[BaseException], failure_class: str) -> None:
+        self._classes[exception_type] = failure_class
+
+    def classify(self, error: Optional[BaseException]) -> str:
+        if error is None:
+            return self.default
+        for exception_type in type(error).__mro__:
+            failure_class = self._classes.get(exception_type)
+            if failure_class is not None:
+                return failure_class
+        return self.default
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional
+
+from app.utils.messaging.pool import HandlerPool
+from app.utils.messaging.schemas import EVENT_TYPE_HEADER
+
+
+Handler = Callable[[Any, str], Awaitable[Any]]
+
+
+class Route:
+    """
+    An event type's handler with its own concurrency limit and timeout.
+    """
+
+    def __init__(self, event_type: str, handler: Handler, concurrency: int, timeout: Optional[float]):
+        self.event_type = event_type
+        self.handler = handler
+        self.timeout = timeout
+        self.pool = HandlerPool(event_type, concurrency)
+
+    async def __call__(self, message_data: Any, request_id: str) -> Any:
+        """
+        Runs the handler, raising asyncio.TimeoutError if it exceeds the timeout.
+        """
+        return await asyncio.wait_for(self.handler(message_data, request_id), self.timeout)
+
+
+class EventRouter:
+    """
+    Maps the `event_type` header to async handlers.
+
+    Routes are resolved with a single dict lookup on the headers, so the body
+    is never touched for unroutable messages. Each route's concurrency caps
+    its handler calls. Isolation between event types comes from
+    `EventSubscriber.subscribe_router`, which gives every route a queue of
+    its own; a handler shared by one queue (`create_handler`) only caps
+    each type, and a slow type can still hold deliveries others wait on.
+    """
+
+    def __init__(self, default_concurrency: int = 10, default_timeout: Optional[float] = 30.0,
+                 header: str = EVENT_TYPE_HEADER):
+        self.default_concurrency = default_concurrency
+        self.default_timeout = default_timeout
+        self.header = header
+        self.routes: Dict[str, Route] = {}
+
+    def add_route(self, event_type: str, handler: Handler, concurrency: Optional[int] = None,
+                  timeout: Optional[float] = None) -> Route:
+        """
+        Registers a handler for an event type.
+        """
+        route = Route(
+            event_type,
+            handler,
+            concurrency or self.default_concurrency,
+            timeout if timeout is not None else self.default_timeout,
+        )
+        self.routes[event_type] = route
+        return route
+
+    def route(self, event_type: str, concurrency: Optional[int] = None, timeout: Optional[float] = None):
+        """
+        Decorator form of `add_route`.
+        """
+        def decorator(handler: Handler) -> Handler:
+            self.add_route(event_type, handler, concurrency, timeout)
+            return handler
+
+        return decorator
+
+    def event_type(self, headers: Optional[Mapping[str, Any]]) -> Optional[str]:
+        return (headers or {}).get(self.header)
+
+    def resolve(self, headers: Optional[Mapping[str, Any]]) -> Optional[Route]:
+        """
+        Returns the route for a message's headers, or None if unroutable.
+        """
+        return self.routes.get(self.event_type(headers))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {event_type: route.pool.stats() for event_type, route in self.routes.items()}
+
+
+event_router = EventRouter()
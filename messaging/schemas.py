@@ -0,0 +1,112 @@
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+try:
+    import fastjsonschema
+except ImportError:  # pragma: no cover - optional speedup
+    fastjsonschema = None
+
+try:
+    import jsonschema
+except ImportError:  # pragma: no cover - optional dependency
+    jsonschema = None
+
+
+Validator = Callable[[Any], None]
+
+EVENT_TYPE_HEADER = "event_type"
+VERSION_HEADER = "version"
+DEFAULT_VERSION = "1"
+
+
+def compile_schema(schema: dict) -> Validator:
+    """
+    Compiles a JSON schema into a validator raising ValueError on mismatch.
+    Uses fastjsonschema's generated code when available, otherwise a
+    pre-built jsonschema validator instance.
+    """
+    if fastjsonschema is not None:
+        return fastjsonschema.compile(schema)
+
+    if jsonschema is None:
+        raise RuntimeError("Compiling schemas requires fastjsonschema or jsonschema")
+
+    validator = jsonschema.validators.validator_for(schema)(schema)
+
+    def validate(data: Any) -> None:
+        error = jsonschema.exceptions.best_match(validator.iter_errors(data))
+        if error is not None:
+            raise ValueError(error.message)
+
+    return validate
+
+
+class SchemaRegistry:
+    """
+    Caches compiled validators keyed by the `event_type` and `version` headers.
+
+    Schemas are compiled once, on first use. Messages whose `user_id`
+    property names a trusted internal producer skip validation entirely;
+    the broker rejects publishes whose `user_id` is not the connection's
+    user, so unlike a header it cannot be set by any publisher.
+    """
+
+    def __init__(
+        self,
+        fallback: Optional[Validator] = None,
+        trusted_producers: Iterable[str] = (),
+    ):
+        """
+        `fallback` validates messages with no registered schema; without it
+        such messages pass unchecked. `trusted_producers` are broker user
+        names.
+        """
+        self.fallback = fallback
+        self.trusted_producers = frozenset(trusted_producers)
+        self._schemas: Dict[Tuple[str, str], dict] = {}
+        self._validators: Dict[Tuple[str, str], Validator] = {}
+
+    def register(self, event_type: str, schema: dict, version: str = DEFAULT_VERSION) -> None:
+        """
+        Registers a JSON schema. It is compiled the first time it is needed.
+        """
+        key = (event_type, str(version))
+        self._schemas[key] = schema
+        self._validators.pop(key, None)
+
+    def register_validator(self, event_type: str, validator: Validator,
+                           version: str = DEFAULT_VERSION) -> None:
+        """
+        Registers an already compiled validator callable.
+        """
+        self._validators[(event_type, str(version))] = validator
+
+    def get(self, event_type: Optional[str], version: Optional[str] = None) -> Optional[Validator]:
+        """
+        Returns the cached validator for an event type and version, or the
+        fallback if none is registered. Only registered schemas are cached, so
+        unknown header values do not grow the cache.
+        """
+        key = (event_type, str(version or DEFAULT_VERSION))
+        validator = self._validators.get(key)
+        if validator is None:
+            schema = self._schemas.get(key)
+            if schema is None:
+                return self.fallback
+            validator = self._validators[key] = compile_schema(schema)
+        return validator
+
+    def is_trusted(self, user_id: Optional[str]) -> bool:
+        return user_id is not None and user_id in self.trusted_producers
+
+    def validate(self, data: Any, headers: Optional[Mapping[str, Any]] = None,
+                 user_id: Optional[str] = None) -> None:
+        """
+        Validates a decoded message using the validator selected by its
+        headers. `user_id` is the message's broker-validated `user_id` property.
+        """
+        headers = headers or {}
+        if self.trusted_producers and self.is_trusted(user_id):
+            return
+        validator = self.get(headers.get(EVENT_TYPE_HEADER), headers.get(VERSION_HEADER))
+        if validator is not None:
+            validator(data)
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import socket
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple, Union
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+SHARD_WEIGHT = "1"
+
+
+def shard_queue_names(queue_name: str, shards: int) -> List[str]:
+    """
+    Returns the names of the `shards` queues behind a sharded subscription.
+    """
+    if shards < 1:
+        raise ValueError("A sharded subscription needs at least one shard")
+    return [f"{queue_name}.shard.{index}" for index in range(shards)]
+
+
+def assign_shards(shards: List[str], members: List[str], member: str) -> List[str]:
+    """
+    Returns the shards `member` owns, by rendezvous hashing each shard onto
+    the live members. Every member computes the same assignment from the
+    same member list, and a join or leave only moves the shards that
+    member gains or loses.
+    """
+    if not members:
+        return []
+
+    def weight(shard: str, candidate: str) -> bytes:
+        # crc32 is linear, so its scores for similar member ids move together.
+        return hashlib.md5(f"{shard}:{candidate}".encode("utf-8")).digest()
+
+    def owner(shard: str) -> str:
+        return max(members, key=lambda candidate: weight(shard, candidate))
+
+    return [shard for shard in shards if owner(shard) == member]
+
+
+def default_member_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class MemoryMembership:
+    """
+    Tracks live consumer instances in process memory, for a single instance
+    or several subscribers sharing one process.
+    """
+
+    def __init__(self, ttl: float = 15.0):
+        self.ttl = ttl
+        self._members: Dict[str, Dict[str, float]] = {}
+
+    async def connect(self) -> None:
+        pass
+
+    async def heartbeat(self, group: str, member: str) -> None:
+        self._members.setdefault(group, {})[member] = time.monotonic() + self.ttl
+
+    async def members(self, group: str) -> List[str]:
+        now = time.monotonic()
+        live = self._members.get(group, {})
+        for member, expires_at in list(live.items()):
+            if expires_at < now:
+                del live[member]
+        return sorted(live)
+
+    async def leave(self, group: str, member: str) -> None:
+        self._members.get(group, {}).pop(member, None)
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisMembership:
+    """
+    Tracks live consumer instances across processes in a Redis sorted set
+    scored by heartbeat time. Members that miss heartbeats for `ttl` seconds
+    are dropped, so a crashed instance's shards are reassigned.
+    """
+
+    def __init__(self, ttl: float = 15.0, prefix: str = "shard-members",
+                 redis_location: Optional[str] = None):
+        self.ttl = ttl
+        self.prefix = prefix
+        self.redis_location = redis_location or settings.REDIS_LOCATION
+        self.redis_connection: Optional[aioredis.Redis] = None
+
+    async def connect(self) -> None:
+        """
+        Establishes a connection to Redis.
+        """
+        self.redis_connection = aioredis.Redis.from_url(self.redis_location)
+
+    async def heartbeat(self, group: str, member: str) -> None:
+        await self.redis_connection.zadd(f"{self.prefix}:{group}", {member: time.time()})
+
+    async def members(self, group: str) -> List[str]:
+        key = f"{self.prefix}:{group}"
+        await self.redis_connection.zremrangebyscore(key, "-inf", time.time() - self.ttl)
+        return sorted(
+            member.decode("utf-8") if isinstance(member, bytes) else member
+            for member in await self.redis_connection.zrange(key, 0, -1)
+        )
+
+    async def leave(self, group: str, member: str) -> None:
+        await self.redis_connection.zrem(f"{self.prefix}:{group}", member)
+
+    async def close(self) -> None:
+        if self.redis_connection is not None:
+            await self.redis_connection.close()
+
+
+Membership = Union[MemoryMembership, RedisMembership]
+
+
+class ShardCoordinator:
+    """
+    Decides which shards of a sharded subscription this instance consumes.
+
+    Each `rebalance` renews this member's heartbeat, reads the live members
+    of the group and reassigns shards with `assign_shards`, returning the
+    shards to start and to stop consuming.
+    """
+
+    def __init__(self, group: str, shards: List[str], membership: Membership,
+                 member_id: Optional[str] = None, interval: float = 5.0):
+        """
+        `interval` is how often, in seconds, the subscriber rebalances. It
+        should stay well under the membership TTL.
+        """
+        self.group = group
+        self.shards = shards
+        self.membership = membership
+        self.member_id = member_id or default_member_id()
+        self.interval = interval
+        self.owned: List[str] = []
+        self.members: List[str] = []
+        self.rebalances = 0
+
+    async def rebalance(self) -> Tuple[List[str], List[str]]:
+        await self.membership.heartbeat(self.group, self.member_id)
+        members = await self.membership.members(self.group)
+        if self.member_id not in members:
+            members = sorted([*members, self.member_id])
+        owned = assign_shards(self.shards, members, self.member_id)
+        acquired = [shard for shard in owned if shard not in self.owned]
+        released = [shard for shard in self.owned if shard not in owned]
+        if acquired or released:
+            self.rebalances += 1
+        self.owned, self.members = owned, members
+        return acquired, released
+
+    async def leave(self) -> None:
+        await self.membership.leave(self.group, self.member_id)
+        self.owned = []
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "shards": len(self.shards),
+            "owned_shards": len(self.owned),
+            "members": len(self.members),
+            "rebalances": self.rebalances,
+        }
@@ -0,0 +1,107 @@
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+StreamOffset = Union[str, int, datetime]
+
+STREAM_OFFSET_SPECS = ("first", "last", "next")
+STORED_OFFSET = "stored"
+
+
+class MemoryOffsetStore:
+    """
+    Keeps committed stream offsets in process memory.
+    """
+
+    def __init__(self):
+        self._offsets: Dict[str, int] = {}
+
+    async def connect(self) -> None:
+        pass
+
+    async def load(self, name: str) -> Optional[int]:
+        return self._offsets.get(name)
+
+    async def save(self, name: str, offset: int) -> None:
+        self._offsets[name] = offset
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisOffsetStore:
+    """
+    Keeps committed stream offsets in Redis so they survive restarts.
+    """
+
+    def __init__(self, prefix: str = "stream-offset", redis_location: Optional[str] = None):
+        self.prefix = prefix
+        self.redis_location = redis_location or settings.REDIS_LOCATION
+        self.redis_connection: Optional[aioredis.Redis] = None
+
+    async def connect(self) -> None:
+        """
+        Establishes a connection to Redis.
+        """
+        self.redis_connection = aioredis.Redis.from_url(self.redis_location)
+
+    async def load(self, name: str) -> Optional[int]:
+        value = await self.redis_connection.get(f"{self.prefix}:{name}")
+        return None if value is None else int(value)
+
+    async def save(self, name: str, offset: int) -> None:
+        await self.redis_connection.set(f"{self.prefix}:{name}", offset)
+
+    async def close(self) -> None:
+        if self.redis_connection is not None:
+            await self.redis_connection.close()
+
+
+OffsetStore = Union[MemoryOffsetStore, RedisOffsetStore]
+
+
+class StreamOffsetTracker:
+    """
+    Records the last processed offset of a stream consumer and commits it to
+    an offset store every `commit_every` messages.
+    """
+
+    def __init__(self, name: str, store: OffsetStore, commit_every: int = 100):
+        self.name = name
+        self.store = store
+        self.commit_every = commit_every
+        self.last_offset: Optional[int] = None
+        self.committed: Optional[int] = None
+        self._uncommitted = 0
+
+    async def start_offset(self, offset: StreamOffset) -> StreamOffset:
+        """
+        Resolves the `x-stream-offset` to consume from. `"stored"` resumes
+        after the last committed offset, or from the start if there is none.
+        """
+        if offset != STORED_OFFSET:
+            if isinstance(offset, str) and offset not in STREAM_OFFSET_SPECS:
+                raise ValueError(f"Unknown stream offset: {offset}")
+            return offset
+        self.committed = await self.store.load(self.name)
+        return "first" if self.committed is None else self.committed + 1
+
+    async def processed(self, offset: Optional[int]) -> None:
+        if offset is None:
+            return
+        self.last_offset = offset
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            await self.commit()
+
+    async def commit(self) -> None:
+        if self.last_offset is not None and self.last_offset != self.committed:
+            await self.store.save(self.name, self.last_offset)
+            self.committed = self.last_offset
+        self._uncommitted = 0
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        return {"last_offset": self.last_offset, "committed_offset": self.committed}
@@ -0,0 +1,81 @@
+from typing import Optional
+
+CLASSIC = "classic"
+QUORUM = "quorum"
+LAZY = "lazy"
+QUEUE_TYPES = (CLASSIC, QUORUM, LAZY)
+
+DROP_HEAD = "drop-head"
+REJECT_PUBLISH = "reject-publish"
+REJECT_PUBLISH_DLX = "reject-publish-dlx"
+OVERFLOW_POLICIES = (DROP_HEAD, REJECT_PUBLISH, REJECT_PUBLISH_DLX)
+
+
+class QueueSpec:
+    """
+    Declare-time shape of a subscription queue: its type, limits, overflow
+    policy and consumer exclusivity.
+
+    Quorum queues are replicated and survive node loss at a throughput and
+    memory cost; lazy (classic) queues keep messages on disk rather than in
+    memory. `max_length` and `max_length_bytes` bound the queue, and
+    `overflow` decides what happens at the bound: drop the oldest message
+    (the broker default), reject new publishes, or reject them to the
+    dead-letter exchange. Unset limits are left to the broker.
+    """
+
+    def __init__(
+        self,
+        queue_type: str = CLASSIC,
+        message_ttl: Optional[int] = None,
+        max_length: Optional[int] = None,
+        max_length_bytes: Optional[int] = None,
+        overflow: Optional[str] = None,
+        single_active_consumer: bool = False,
+        delivery_limit: Optional[int] = None,
+    ):
+        """
+        `message_ttl` is in milliseconds. `delivery_limit` (quorum queues
+        only) dead-letters a message after that many redeliveries.
+        """
+        if queue_type not in QUEUE_TYPES:
+            raise ValueError(f"Unknown queue type: {queue_type}")
+        if overflow is not None and overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        if queue_type == QUORUM and overflow == REJECT_PUBLISH_DLX:
+            raise ValueError("Quorum queues do not support reject-publish-dlx overflow")
+        if delivery_limit is not None and queue_type != QUORUM:
+            raise ValueError("delivery_limit is only supported by quorum queues")
+        self.queue_type = queue_type
+        self.message_ttl = message_ttl
+        self.max_length = max_length
+        self.max_length_bytes = max_length_bytes
+        self.overflow = overflow
+        self.single_active_consumer = single_active_consumer
+        self.delivery_limit = delivery_limit
+
+    def arguments(self, dead_letter_exchange: str) -> dict:
+        """
+        Returns the `x-` declare arguments. Settings left at their defaults
+        are omitted, so existing classic queues keep matching their original
+        declaration.
+        """
+        arguments = {}
+        if self.queue_type == QUORUM:
+            arguments["x-queue-type"] = QUORUM
+        elif self.queue_type == LAZY:
+            arguments["x-queue-mode"] = LAZY
+        if self.message_ttl is not None:
+            arguments["x-message-ttl"] = self.message_ttl
+        arguments["x-dead-letter-exchange"] = dead_letter_exchange
+        if self.max_length is not None:
+            arguments["x-max-length"] = self.max_length
+        if self.max_length_bytes is not None:
+            arguments["x-max-length-bytes"] = self.max_length_bytes
+        if self.overflow is not None:
+            arguments["x-overflow"] = self.overflow
+        if self.single_active_consumer:
+            arguments["x-single-active-consumer"] = True
+        if self.delivery_limit is not None:
+            arguments["x-delivery-limit"] = self.delivery_limit
+        return arguments
@@ -0,0 +1,209 @@
+import asyncio
+import zlib
+from typing import Any, Dict, List, Optional, Union
+
+import aio_pika
+import inject
+
+from app.core.config import settings
+from app.services.loggers import AuditLogger
+from app.utils.messaging import AMQPConnector, CodecRegistry, default_codecs
+from app.utils.messaging.ordering import PARTITION_KEY
+
+
+class EventPublisher:
+    """
+    A publisher class for sending RabbitMQ messages with publisher confirms.
+
+    Messages are queued per pooled confirm-mode channel and published by
+    that channel's worker. Each worker drains whatever has accumulated (up
+    to `batch_size`) and publishes it with pipelined confirms, so batches
+    grow with load and single messages go out immediately when idle.
+
+    Channels run in parallel, so publish order is only preserved between
+    messages on the same channel: messages sharing a partition key (the
+    `auction_id` header or body field by default) are pinned to one channel
+    by its hash, and keyless messages are spread round-robin with no order.
+    """
+
+    @inject.autoparams("audit_logger", "connector")
+    def __init__(
+        self,
+        exchange_name: str,
+        audit_logger: AuditLogger,
+        connector: AMQPConnector,
+        pool_size: int = 4,
+        batch_size: int = 100,
+        codecs: Optional[CodecRegistry] = None,
+    ):
+        """
+        Initializes the instance with connection settings.
+        """
+        self.connection_url = settings.rabbitmq_url.unicode_string()
+        self.connector = connector
+        self.exchange_name = exchange_name
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.codecs = codecs or default_codecs()
+        self.connection = None
+        self.channels: List[aio_pika.abc.AbstractChannel] = []
+        self.published = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.logger = audit_logger
+        self._owns_connection = False
+        self._queues: List[asyncio.Queue] = []
+        self._unkeyed = 0
+        self._workers: List[asyncio.Task] = []
+
+    async def connect(self, connection: Optional[aio_pika.abc.AbstractRobustConnection] = None):
+        """
+        Opens the channel pool, on `connection` if given (e.g. an
+        EventSubscriber's), otherwise on a connection of its own.
+        """
+        try:
+            if connection is None:
+                connection = await self.connector.connect(self.connection_url)
+                self._owns_connection = True
+            self.connection = connection
+            self.channels = [
+                await connection.channel(publisher_confirms=True)
+                for _ in range(self.pool_size)
+            ]
+            self._queues = [asyncio.Queue() for _ in self.channels]
+            self._workers = [
+                asyncio.create_task(self._run_channel(channel, queue))
+                for channel, queue in zip(self.channels, self._queues)
+            ]
+        except aio_pika.AMQPConnectionError as e:
+            self.logger.error(f"Error while connecting publisher to RabbitMQ: {e}")
+            raise
+
+    def publish(
+        self,
+        message: Union[aio_pika.Message, Any],
+        routing_key: str = "",
+        exchange: Optional[str] = None,
+        headers: Optional[Dict[str, Any]] = None,
+        content_type: str = "application/json",
+        user_id: Optional[str] = None,
+        partition_key: Optional[str] = None,
+    ) -> asyncio.Future:
+        """
+        Queues a message and returns a future resolved once the broker
+        confirms it. Non-Message payloads are encoded with the codec for
+        `content_type`. `exchange` defaults to the publisher's exchange;
+        pass "" for the default exchange, which routes by queue name.
+        `user_id` must be the connection's user; the broker checks it, so
+        consumers can trust it to identify the producer. Messages with the
+        same `partition_key` (by default the `auction_id` header, then body
+        field) are published in call order.
+        """
+        if not self._queues:
+            raise RuntimeError("EventPublisher is not connected")
+        if partition_key is None:
+            partition_key = self._partition_key(message, headers)
+        if not isinstance(message, aio_pika.Message):
+            message = aio_pika.Message(
+                body=self.codecs.encode(message, content_type),
+                headers=headers or {},
+                content_type=content_type,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                user_id=user_id,
+            )
+        future = asyncio.get_running_loop().create_future()
+        exchange = self.exchange_name if exchange is None else exchange
+        self._queues[self._channel_for(partition_key)].put_nowait(
+            (exchange, message, routing_key, future)
+        )
+        return future
+
+    @staticmethod
+    def _partition_key(message: Union[aio_pika.Message, Any],
+                       headers: Optional[Dict[str, Any]]) -> Optional[str]:
+        if isinstance(message, aio_pika.Message):
+            value = (message.headers or {}).get(PARTITION_KEY)
+        else:
+            value = (headers or {}).get(PARTITION_KEY)
+            if value is None and isinstance(message, dict):
+                value = message.get(PARTITION_KEY)
+        return None if value is None else str(value)
+
+    def _channel_for(self, key: Optional[str]) -> int:
+        """
+        Returns the index of the channel a message goes out on. Keyless
+        messages are spread round-robin.
+        """
+        if key is None:
+            self._unkeyed += 1
+            return self._unkeyed % len(self._queues)
+        return zlib.crc32(key.encode("utf-8")) % len(self._queues)
+
+    async def _run_channel(self, channel: aio_pika.abc.AbstractChannel, queue: asyncio.Queue):
+        exchanges: Dict[str, aio_pika.abc.AbstractExchange] = {}
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            self.in_flight += len(batch)
+            try:
+                for name, *_ in batch:
+                    if name not in exchanges:
+                        exchanges[name] = await channel.get_exchange(name, ensure=False)
+                results = await asyncio.gather(
+                    *(exchanges[name].publish(message, routing_key=routing_key)
+                      for name, message, routing_key, _ in batch),
+                    return_exceptions=True,
+                )
+            except Exception as e:
+                results = [e] * len(batch)
+            finally:
+                self.in_flight -= len(batch)
+
+            for (_, _, _, future), result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    self.failed += 1
+                    if not future.done():
+                        future.set_exception(result)
+                else:
+                    self.published += 1
+                    if not future.done():
+                        future.set_result(result)
+                queue.task_done()
+
+    async def flush(self):
+        """
+        Waits until every queued message has been confirmed or failed.
+        """
+        for queue in self._queues:
+            await queue.join()
+
+    @property
+    def pending(self) -> int:
+        return sum(queue.qsize() for queue in self._queues) + self.in_flight
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self.pending,
+            "published": self.published,
+            "failed": self.failed,
+        }
+
+    async def close(self):
+        """
+        Flushes queued messages, then closes the channel pool and, if owned,
+        the connection.
+        """
+        try:
+            await self.flush()
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            for channel in self.channels:
+                await channel.close()
+            if self._owns_connection:
+                await self.connection.close()
+        except Exception as e:
+            self.logger.error(f"Error closing publisher: {e}")
+            raise
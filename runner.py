@@ -0,0 +1,223 @@
+import argparse
+import asyncio
+import importlib
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import inject
+
+from app.services.di import configure_injection
+from app.services.loggers import AuditLogger
+from app.utils.consumer import DEFAULT_DRAIN_TIMEOUT, EventSubscriber
+
+Setup = Callable[[EventSubscriber], Awaitable[None]]
+
+# Time a worker gets after its drain deadline to close channels and connections.
+SHUTDOWN_MARGIN = 10.0
+
+
+def _run_worker(worker_id: int, setup: Setup, subscriber_kwargs: Dict[str, Any],
+                status_queue: multiprocessing.Queue, heartbeat_interval: float):
+    """
+    Worker process entry point: one event loop, connection and channel.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    inject.configure_once(configure_injection)
+    asyncio.run(_serve(worker_id, setup, subscriber_kwargs, status_queue, heartbeat_interval))
+
+
+async def _serve(worker_id: int, setup: Setup, subscriber_kwargs: Dict[str, Any],
+                 status_queue: multiprocessing.Queue, heartbeat_interval: float):
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+
+    subscriber = EventSubscriber(**subscriber_kwargs)
+    await subscriber.connect()
+    await setup(subscriber)
+
+    while not stop.is_set():
+        status_queue.put((worker_id, os.getpid(), time.time(), subscriber.get_metrics()))
+        try:
+            await asyncio.wait_for(stop.wait(), heartbeat_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    await subscriber.close()
+
+
+class ConsumerRunner:
+    """
+    Runs EventSubscriber workers in separate processes and supervises them.
+
+    Each worker connects on its own and calls `setup(subscriber)` to register
+    the same subscriptions. Crashed workers are restarted with backoff; on
+    SIGTERM or SIGINT every worker is asked to close and is killed if it does
+    not exit within `shutdown_timeout`, which must outlast the workers'
+    `drain_timeout` so a full drain is not cut short by the kill.
+    """
+
+    @inject.autoparams("audit_logger")
+    def __init__(
+        self,
+        setup: Setup,
+        subscriber_kwargs: Dict[str, Any],
+        audit_logger: AuditLogger,
+        workers: Optional[int] = None,
+        heartbeat_interval: float = 5.0,
+        shutdown_timeout: Optional[float] = None,
+        max_restart_delay: float = 30.0,
+    ):
+        """
+        `setup` must be importable by name (a module-level coroutine function)
+        so it can be sent to spawned processes. `shutdown_timeout` defaults
+        to the workers' drain timeout plus `SHUTDOWN_MARGIN`.
+        """
+        drain_timeout = subscriber_kwargs.get("drain_timeout", DEFAULT_DRAIN_TIMEOUT)
+        if shutdown_timeout is None:
+            shutdown_timeout = drain_timeout + SHUTDOWN_MARGIN
+        elif shutdown_timeout <= drain_timeout:
+            raise ValueError("shutdown_timeout must be longer than the workers' drain_timeout")
+        self.setup = setup
+        self.subscriber_kwargs = subscriber_kwargs
+        self.workers = workers or os.cpu_count() or 1
+        self.heartbeat_interval = heartbeat_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.max_restart_delay = max_restart_delay
+        self.logger = audit_logger
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.restarts: Dict[int, int] = {}
+        self.heartbeats: Dict[int, tuple] = {}
+        self._next_start: Dict[int, float] = {}
+        self._context = multiprocessing.get_context("spawn")
+        self._status_queue = self._context.Queue()
+        self._stopping = False
+
+    def _start_worker(self, worker_id: int):
+        process = self._context.Process(
+            target=_run_worker,
+            args=(worker_id, self.setup, self.subscriber_kwargs,
+                  self._status_queue, self.heartbeat_interval),
+            name=f"event-subscriber-{worker_id}",
+            daemon=False,
+        )
+        process.start()
+        self.processes[worker_id] = process
+        self.logger.log(f"Started consumer worker {worker_id} (pid {process.pid})")
+
+    def _stop(self, *_):
+        self._stopping = True
+
+    def _supervise(self):
+        now = time.time()
+        for worker_id, process in self.processes.items():
+            if process.is_alive() or self._stopping:
+                continue
+            if worker_id not in self._next_start:
+                restarts = self.restarts.get(worker_id, 0)
+                delay = min(2 ** restarts, self.max_restart_delay)
+                self.logger.error(
+                    f"Consumer worker {worker_id} exited with code {process.exitcode}, "
+                    f"restarting in {delay}s")
+                self._next_start[worker_id] = now + delay
+            elif now >= self._next_start[worker_id]:
+                del self._next_start[worker_id]
+                self.restarts[worker_id] = self.restarts.get(worker_id, 0) + 1
+                self._start_worker(worker_id)
+
+    def _collect_heartbeats(self):
+        while True:
+            try:
+                worker_id, pid, timestamp, metrics = self._status_queue.get_nowait()
+            except queue.Empty:
+                return
+            self.heartbeats[worker_id] = (pid, timestamp, metrics)
+
+    def health(self) -> Dict[str, Any]:
+        """
+        Aggregates the latest heartbeat of every worker. A worker is healthy
+        if it is alive and reported within three heartbeat intervals.
+        """
+        now = time.time()
+        workers = {}
+        for worker_id, process in self.processes.items():
+            pid, timestamp, metrics = self.heartbeats.get(worker_id, (process.pid, None, {}))
+            workers[worker_id] = {
+                "pid": process.pid,
+                "alive": process.is_alive(),
+                "healthy": process.is_alive() and timestamp is not None
+                and now - timestamp < 3 * self.heartbeat_interval,
+                "restarts": self.restarts.get(worker_id, 0),
+                "metrics": metrics if pid == process.pid else {},
+            }
+        return {
+            "healthy": sum(worker["healthy"] for worker in workers.values()),
+            "workers": workers,
+        }
+
+    def _shutdown(self):
+        self.logger.log(f"Stopping {len(self.processes)} consumer workers")
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.time() + self.shutdown_timeout
+        for worker_id, process in self.processes.items():
+            process.join(max(deadline - time.time(), 0))
+            if process.is_alive():
+                self.logger.warn(f"Consumer worker {worker_id} did not stop in time, killing")
+                process.kill()
+                process.join()
+
+    def run(self):
+        """
+        Starts the workers and supervises them until SIGTERM or SIGINT.
+        """
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for worker_id in range(self.workers):
+            self._start_worker(worker_id)
+
+        last_report = time.time()
+        while not self._stopping:
+            time.sleep(1)
+            self._collect_heartbeats()
+            self._supervise()
+            if time.time() - last_report >= self.heartbeat_interval:
+                last_report = time.time()
+                health = self.health()
+                self.logger.debug(f"Consumer workers healthy: {health['healthy']}/{self.workers}")
+
+        self._shutdown()
+
+
+def _load_setup(path: str) -> Setup:
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run EventSubscriber workers across processes.")
+    parser.add_argument("setup", help="module:function coroutine registering subscriptions")
+    parser.add_argument("--exchange", required=True)
+    parser.add_argument("--dead-letter-exchange", required=True)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--prefetch", type=int, default=10)
+    args = parser.parse_args()
+
+    inject.configure_once(configure_injection)
+    ConsumerRunner(
+        _load_setup(args.setup),
+        {
+            "exchange_name": args.exchange,
+            "dead_letter_exchange": args.dead_letter_exchange,
+            "prefetch_count": args.prefetch,
+        },
+        workers=args.workers,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ from app.services.loggers.base import BaseLogger
 from app.services.loggers.cloud_logger import CloudLogger
 from app.services.loggers.console import ConsoleLogger
 from app.utils.managers.redis_pubsub import RedisPubSubManager
+from app.utils.messaging import AMQPConnector
 
 
 def configure_injection(binder: inject.Binder):
@@ -21,3 +22,4 @@ def configure_injection(binder: inject.Binder):
 
     binder.bind_to_provider(AuditLogger, AuditLogger())
     binder.bind_to_provider(RedisPubSubManager, RedisPubSubManager())
+    binder.bind(AMQPConnector, AMQPConnector())
@@ -0,0 +1,65 @@
+import asyncio
+import time
+from typing import Callable
+
+import pytest
+
+from app.utils.consumer import EventSubscriber
+from app.utils.messaging.fake_broker import FakeBroker
+
+
+class RecordingLogger:
+    """
+    Stands in for AuditLogger, keeping every line for assertions.
+    """
+
+    def __init__(self):
+        self.lines = []
+
+    def log(self, action, user_id=None, metadata=None, severity="INFO", trace_id=None):
+        self.lines.append(("log", action))
+
+    def warn(self, message, trace_id=None):
+        self.lines.append(("warn", message))
+
+    def error(self, message, trace_id=None):
+        self.lines.append(("error", message))
+
+    def debug(self, message, trace_id=None):
+        self.lines.append(("debug", message))
+
+    def critical(self, message, trace_id=None):
+        self.lines.append(("critical", message))
+
+
+@pytest.fixture
+def broker() -> FakeBroker:
+    # Retry tiers of seconds expire in milliseconds.
+    return FakeBroker(ttl_scale=0.001)
+
+
+@pytest.fixture
+def make_subscriber(broker) -> Callable[..., EventSubscriber]:
+    def make(exchange_name: str = "events", **kwargs) -> EventSubscriber:
+        subscriber = EventSubscriber(
+            exchange_name, f"{exchange_name}_dlx",
+            audit_logger=RecordingLogger(), connector=broker, **kwargs
+        )
+        # Keep dead-lettered messages around for the length of a test.
+        subscriber.message_ttl = 3_600_000_000
+        return subscriber
+
+    return make
+
+
+async def wait_until(broker: FakeBroker, predicate: Callable[[], bool], timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached before timeout")
+        await asyncio.sleep(0.005)
+        await broker.settle()
+
+
+def dead_lettered(broker: FakeBroker, queue: str = "dead_letter_queue"):
+    return [envelope for envelope, _ in broker.queues[queue].ready]
@@ -0,0 +1,90 @@
+import asyncio
+
+from app.utils.messaging import CLOSED, OPEN, CircuitBreaker
+from conftest import dead_lettered, wait_until
+
+
+async def subscribe_failing(subscriber, breaker, failures):
+    """
+    Subscribes `qa` with a callback that fails its first `failures` calls.
+    """
+    calls = []
+
+    async def callback(message_data, request_id):
+        calls.append(request_id)
+        if len(calls) <= failures:
+            raise ConnectionError("auction service unavailable")
+
+    await subscriber.subscribe_events("qa", callback, breaker=breaker)
+    return calls
+
+
+async def publish(subscriber, *request_ids):
+    for request_id in request_ids:
+        await subscriber.publisher.publish({"event": "bid_placed"}, headers={"request_id": request_id})
+
+
+def test_breaker_opens_on_failure_ratio_and_defers(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber(prefetch_count=1)
+        await subscriber.connect()
+        breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4, open_timeout=3600)
+        calls = await subscribe_failing(subscriber, breaker, failures=100)
+
+        await publish(subscriber, "r1", "r2", "r3", "r4")
+        await wait_until(broker, lambda: breaker.state == OPEN)
+        await publish(subscriber, "r5")
+        await wait_until(broker, lambda: breaker.rejected >= 5)
+
+        # Deferred deliveries cycle through the delay queues without reaching
+        # the callback or using up their retries.
+        assert sorted(calls) == ["r1", "r2", "r3", "r4"]
+        assert breaker.opened == 1
+        assert not subscriber.consumers["qa"].paused
+        assert dead_lettered(broker) == []
+        await subscriber.close(drain=False)
+
+    asyncio.run(run())
+
+
+def test_pausing_breaker_stops_consuming_instead_of_deferring(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber(prefetch_count=1)
+        await subscriber.connect()
+        breaker = CircuitBreaker(window=4, min_calls=4, open_timeout=3600, pause=True)
+        calls = await subscribe_failing(subscriber, breaker, failures=100)
+
+        await publish(subscriber, "r1", "r2", "r3", "r4")
+        await wait_until(broker, lambda: subscriber.consumers["qa"].paused)
+        await publish(subscriber, "r5")
+        await wait_until(broker, lambda: len(broker.queues["qa"].ready) == 5)
+
+        assert sorted(calls) == ["r1", "r2", "r3", "r4"]
+        assert breaker.rejected == 0
+        await subscriber.close(drain=False)
+
+    asyncio.run(run())
+
+
+def test_half_open_probe_closes_breaker(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber(prefetch_count=1)
+        await subscriber.connect()
+        breaker = CircuitBreaker(window=4, min_calls=4, open_timeout=0.1, half_open_probes=1, pause=True)
+        calls = await subscribe_failing(subscriber, breaker, failures=4)
+
+        await publish(subscriber, "r1", "r2", "r3", "r4")
+        await wait_until(broker, lambda: subscriber.consumers["qa"].paused)
+        assert len(calls) == 4
+        await publish(subscriber, "r5")
+
+        # After open_timeout the queue resumes half-open; the first call is
+        # the probe and its success closes the breaker.
+        await wait_until(broker, lambda: len(set(calls[4:])) == 5)
+        assert breaker.state == CLOSED
+        assert breaker.opened == 1
+        assert not subscriber.consumers["qa"].paused
+        assert dead_lettered(broker) == []
+        await subscriber.close()
+
+    asyncio.run(run())
@@ -0,0 +1,241 @@
+import asyncio
+import random
+
+import aio_pika
+
+from app.utils.consumer import _Consumer
+from app.utils.messaging import (
+    PERMANENT,
+    TRANSIENT,
+    BackpressureController,
+    Deduplicator,
+    QueueDepthMonitor,
+    SchemaRegistry,
+)
+from app.utils.messaging.fake_broker import FakeChannel
+from conftest import dead_lettered, wait_until
+
+
+def test_failing_callback_is_retried_then_dead_lettered(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber()
+        await subscriber.connect()
+        calls = []
+
+        async def callback(message_data, request_id):
+            calls.append(request_id)
+            raise RuntimeError("downstream unavailable")
+
+        await subscriber.subscribe_events("bids", callback)
+        await subscriber.publisher.publish({"event": "bid_placed"}, headers={"request_id": "r1"})
+        await wait_until(broker, lambda: dead_lettered(broker))
+
+        [envelope] = dead_lettered(broker)
+        assert len(calls) == subscriber.max_retries + 1
+        assert envelope.headers["request_id"] == "r1"
+        assert envelope.headers["x-failure-class"] == TRANSIENT
+        assert envelope.headers["x-origin-queue"] == "bids"
+        assert envelope.headers["x-retries"] == subscriber.max_retries
+        await subscriber.close()
+
+    asyncio.run(run())
+
+
+def test_malformed_message_is_dead_lettered_without_retries(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber()
+        await subscriber.connect()
+
+        async def callback(message_data, request_id):
+            raise AssertionError("callback must not run")
+
+        await subscriber.subscribe_events("bids", callback)
+        await subscriber.publisher.publish(
+            aio_pika.Message(b"not json", headers={"request_id": "poison"})
+        )
+        await wait_until(broker, lambda: dead_lettered(broker))
+
+        [envelope] = dead_lettered(broker)
+        assert envelope.headers["x-failure-class"] == PERMANENT
+        assert "x-retries" not in envelope.headers
+        await subscriber.close()
+
+    asyncio.run(run())
+
+
+def test_batch_is_acked_with_one_multiple_ack(broker, make_subscriber, monkeypatch):
+    settlements = []
+    settle = FakeChannel._settle
+
+    def record_settle(channel, delivery_tag, multiple, requeue):
+        settlements.append((multiple, requeue))
+        settle(channel, delivery_tag, multiple, requeue)
+
+    monkeypatch.setattr(FakeChannel, "_settle", record_settle)
+
+    async def run():
+        subscriber = make_subscriber()
+        await subscriber.connect()
+        batches = []
+
+        async def callback(messages, request_ids):
+            batches.append([message["i"] for message in messages])
+            return [1] if len(batches) == 1 else None
+
+        await subscriber.subscribe_batch("bids", callback, batch_size=5, batch_timeout=0.05)
+        for i in range(5):
+            await subscriber.publisher.publish({"event": "bid_placed", "i": i})
+        await wait_until(broker, lambda: len(batches) == 2)
+
+        assert batches == [[0, 1, 2, 3, 4], [1]]
+        # One multiple=True ack per batch; the failed item went to a retry queue.
+        assert settlements == [(True, None), (True, None)]
+        assert broker.queues["bids"].message_count == 0
+        await subscriber.close()
+
+    asyncio.run(run())
+
+
+def test_ordered_subscription_keeps_per_key_order(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber(prefetch_count=20)
+        await subscriber.connect()
+        seen = {}
+
+        async def callback(message_data, request_id):
+            await asyncio.sleep(random.uniform(0, 0.005))
+            seen.setdefault(message_data["auction_id"], []).append(message_data["sequence"])
+
+        await subscriber.subscribe_ordered("bids", callback, lanes=4)
+        for sequence in range(100):
+            auction_id = f"auction-{sequence % 7}"
+            await subscriber.publisher.publish(
+                {"event": "bid_placed", "auction_id": auction_id, "sequence": sequence},
+                headers={"auction_id": auction_id},
+            )
+        await wait_until(broker, lambda: sum(map(len, seen.values())) == 100)
+
+        assert len(seen) == 7
+        assert all(sequences == sorted(sequences) for sequences in seen.values())
+        await subscriber.close()
+
+    asyncio.run(run())
+
+
+def test_backpressure_prefetch_stays_within_autoscaled_pool(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber(
+            backpressure=BackpressureController(max_prefetch=50, interval=0.01),
+            depth_monitor=QueueDepthMonitor(interval=0.01, max_pool_size=20),
+        )
+        await subscriber.connect()
+
+        async def callback(message_data, request_id):
+            pass
+
+        await subscriber.subscribe_events("qa", callback)
+        # An idle queue: the depth monitor shrinks the pool while backpressure
+        # would keep raising the prefetch.
+        await asyncio.sleep(0.3)
+
+        pool, consumer = subscriber.pools["qa"], subscriber.consumers["qa"]
+        assert pool.size == 1
+        assert consumer.prefetch_count <= pool.size
+        await subscriber.close()
+
+    asyncio.run(run())
+
+
+def test_trusted_producer_is_keyed_on_user_id(broker, make_subscriber):
+    async def run():
+        def reject_all(message_data):
+            raise ValueError("schema mismatch")
+
+        schemas = SchemaRegistry(fallback=reject_all, trusted_producers=["auctions"])
+        subscriber = make_subscriber(schemas=schemas)
+        await subscriber.connect()
+        received = []
+
+        async def callback(message_data, request_id):
+            received.append(request_id)
+
+        await subscriber.subscribe_events("qa", callback)
+        await subscriber.publisher.publish(
+            {"event": "bid_placed"}, headers={"request_id": "spoofed", "producer": "auctions"}
+        )
+        await subscriber.publisher.publish(
+            {"event": "bid_placed"}, headers={"request_id": "trusted"}, user_id="auctions"
+        )
+        await wait_until(broker, lambda: received and dead_lettered(broker))
+
+        assert received == ["trusted"]
+        assert [envelope.headers["request_id"] for envelope in dead_lettered(broker)] == ["spoofed"]
+        await subscriber.close()
+
+    asyncio.run(run())
+
+
+def test_schema_registry_caches_only_registered_schemas():
+    schemas = SchemaRegistry(fallback=lambda data: None)
+    schemas.register_validator("bid_placed", lambda data: None)
+    for version in range(100):
+        schemas.validate({}, {"event_type": "unknown", "version": str(version)})
+    schemas.validate({}, {"event_type": "bid_placed"})
+
+    assert list(schemas._validators) == [("bid_placed", "1")]
+
+
+def test_dedup_is_scoped_to_the_queue(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber(dedup=Deduplicator())
+        await subscriber.connect()
+        received = {"qa": [], "qb": []}
+
+        def callback(queue_name):
+            async def on_message(message_data, request_id):
+                received[queue_name].append(request_id)
+            return on_message
+
+        await subscriber.subscribe_events("qa", callback("qa"))
+        await subscriber.subscribe_events("qb", callback("qb"))
+        await subscriber.publisher.publish({"event": "bid_placed"}, headers={"request_id": "r1"})
+        await wait_until(broker, lambda: received["qa"] and received["qb"])
+        await subscriber.publisher.publish({"event": "bid_placed"}, headers={"request_id": "r1"})
+        await asyncio.sleep(0.02)
+        await broker.settle()
+
+        assert received == {"qa": ["r1"], "qb": ["r1"]}
+        assert subscriber.dedup.skipped == 2
+        await subscriber.close()
+
+    asyncio.run(run())
+
+
+def test_concurrent_consumer_starts_keep_their_own_prefetch(broker, monkeypatch):
+    set_qos = FakeChannel.set_qos
+
+    async def slow_set_qos(self, *args, **kwargs):
+        await set_qos(self, *args, **kwargs)
+        await asyncio.sleep(0)
+
+    monkeypatch.setattr(FakeChannel, "set_qos", slow_set_qos)
+
+    async def run():
+        connection = await broker.connect()
+        channel = await connection.channel()
+
+        async def on_message(message):
+            pass
+
+        consumers = [
+            _Consumer(await channel.declare_queue(name), channel, on_message, prefetch_count)
+            for name, prefetch_count in (("qa", 1), ("qb", 50))
+        ]
+        await asyncio.gather(*(consumer.start() for consumer in consumers))
+
+        assert [
+            next(iter(broker.queues[name].consumers.values())).prefetch_count for name in ("qa", "qb")
+        ] == [1, 50]
+        await connection.close()
+
+    asyncio.run(run())
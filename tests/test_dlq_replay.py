@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.utils.dlq_replay import DeadLetterReplayer
+from app.utils.messaging import InvalidMessageError, QueueSpec
+from conftest import dead_lettered, wait_until
+
+
+def test_replay_returns_messages_to_their_origin_queue_only(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber()
+        await subscriber.connect()
+        received = {"qa": [], "qb": []}
+        failing = {"qa": True}
+
+        def callback(queue_name):
+            async def on_message(message_data, request_id):
+                received[queue_name].append(request_id)
+                if failing.get(queue_name):
+                    raise InvalidMessageError("rejected by qa")
+            return on_message
+
+        await subscriber.subscribe_events("qa", callback("qa"))
+        await subscriber.subscribe_events("qb", callback("qb"))
+        await subscriber.publisher.publish({"event": "bid_placed"}, headers={"request_id": "r1"})
+        await wait_until(broker, lambda: dead_lettered(broker))
+        assert received == {"qa": ["r1"], "qb": ["r1"]}
+
+        failing["qa"] = False
+        summary = await DeadLetterReplayer(subscriber, rate=0).run()
+        await wait_until(broker, lambda: len(received["qa"]) == 2)
+        await asyncio.sleep(0.02)
+        await broker.settle()
+
+        assert summary["replayed"] == 1
+        assert summary["targets"] == {"(default):qa": 1}
+        assert received == {"qa": ["r1", "r1"], "qb": ["r1"]}
+        assert dead_lettered(broker) == []
+        await subscriber.close()
+
+    asyncio.run(run())
+
+
+def test_replay_returns_broker_dead_letters_to_their_queue_only(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber(prefetch_count=1)
+        await subscriber.connect()
+        received = {"qa": [], "qb": []}
+        release = asyncio.Event()
+
+        async def on_qa(message_data, request_id):
+            received["qa"].append(request_id)
+            await release.wait()
+
+        async def on_qb(message_data, request_id):
+            received["qb"].append(request_id)
+
+        await subscriber.subscribe_events("qa", on_qa, queue_spec=QueueSpec(max_length=1))
+        await subscriber.subscribe_events("qb", on_qb)
+        # r1 is held by qa's callback and r3 pushes r2 off the head of qa.
+        for request_id in ("r1", "r2", "r3"):
+            await subscriber.publisher.publish({"event": "bid_placed"}, headers={"request_id": request_id})
+        await wait_until(broker, lambda: dead_lettered(broker) and len(received["qb"]) == 3)
+        release.set()
+        await wait_until(broker, lambda: len(received["qa"]) == 2)
+
+        summary = await DeadLetterReplayer(subscriber, rate=0).run()
+        await wait_until(broker, lambda: len(received["qa"]) == 3)
+        await asyncio.sleep(0.02)
+        await broker.settle()
+
+        assert summary["targets"] == {"(default):qa": 1}
+        assert received == {"qa": ["r1", "r3", "r2"], "qb": ["r1", "r2", "r3"]}
+        await subscriber.close()
+
+    asyncio.run(run())
+
+
+def test_replay_filters_on_dead_lettered_time(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber()
+        await subscriber.connect()
+
+        async def callback(message_data, request_id):
+            raise InvalidMessageError("rejected")
+
+        await subscriber.subscribe_events("qa", callback)
+        await subscriber.publisher.publish({"event": "bid_placed"}, headers={"request_id": "r1"})
+        await wait_until(broker, lambda: dead_lettered(broker))
+
+        later = datetime.now(timezone.utc) + timedelta(hours=1)
+        summary = await DeadLetterReplayer(subscriber, rate=0, since=later, dry_run=True).run()
+        assert summary["matched"] == 0
+
+        since = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        summary = await DeadLetterReplayer(subscriber, rate=0, since=since, dry_run=True).run()
+        assert summary["matched"] == 1
+        await subscriber.close()
+
+    asyncio.run(run())
@@ -0,0 +1,34 @@
+import asyncio
+
+from app.utils.publisher import EventPublisher
+from conftest import RecordingLogger
+
+
+def test_messages_sharing_an_auction_keep_one_channel_in_order(broker):
+    async def run():
+        publisher = EventPublisher("events", audit_logger=RecordingLogger(), connector=broker, pool_size=4)
+        await publisher.connect()
+        await publisher.channels[0].declare_exchange("events", type="fanout")
+
+        futures = [
+            publisher.publish({"event": "bid_placed", "auction_id": index % 5, "sequence": index})
+            for index in range(100)
+        ]
+        # publish() queues synchronously, so the channel queues can be read
+        # before any worker runs.
+        channels = {}
+        for position, queue in enumerate(publisher._queues):
+            for _, message, _, _ in list(queue._queue):
+                body = publisher.codecs.decode(message.body, message.content_type)
+                channels.setdefault(body["auction_id"], []).append((position, body["sequence"]))
+
+        for auction_id, placed in channels.items():
+            assert len({position for position, _ in placed}) == 1
+            assert [sequence for _, sequence in placed] == list(range(auction_id, 100, 5))
+        assert len({placed[0][0] for placed in channels.values()}) > 1
+
+        await asyncio.gather(*futures)
+        assert publisher.stats()["published"] == 100
+        await publisher.close()
+
+    asyncio.run(run())
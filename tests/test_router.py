@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from app.utils.messaging import EventRouter
+from conftest import dead_lettered, wait_until
+
+
+def test_slow_event_type_does_not_starve_others(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber()
+        await subscriber.connect()
+        router = EventRouter()
+        handled = {}
+
+        @router.route("auction_settled", concurrency=2)
+        async def on_settled(message_data, request_id):
+            await asyncio.sleep(0.3)
+
+        @router.route("bid_placed")
+        async def on_bid(message_data, request_id):
+            handled[request_id] = time.monotonic()
+
+        await subscriber.subscribe_router("auctions", router)
+        for index in range(20):
+            await subscriber.publisher.publish(
+                {"event": "auction_settled", "auction": index}, headers={"event_type": "auction_settled", "request_id": f"s{index}"}
+            )
+        published_at = time.monotonic()
+        await subscriber.publisher.publish(
+            {"event": "bid_placed", "auction": 1}, headers={"event_type": "bid_placed", "request_id": "b1"}
+        )
+        deadline = time.monotonic() + 2
+        while "b1" not in handled and time.monotonic() < deadline:
+            await asyncio.sleep(0.005)
+
+        assert handled["b1"] - published_at < 0.2
+        await subscriber.close(drain=False)
+
+    asyncio.run(run())
+
+
+def test_unroutable_event_type_is_dead_lettered(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber()
+        await subscriber.connect()
+        router = EventRouter()
+        handled = []
+
+        @router.route("bid_placed")
+        async def on_bid(message_data, request_id):
+            handled.append(request_id)
+
+        await subscriber.subscribe_router("auctions", router)
+        await subscriber.publisher.publish(
+            {"event": "auction_cancelled", "auction": 1}, headers={"event_type": "auction_cancelled", "request_id": "c1"}
+        )
+        await subscriber.publisher.publish(
+            {"event": "bid_placed", "auction": 1}, headers={"event_type": "bid_placed", "request_id": "b1"}
+        )
+        await wait_until(broker, lambda: handled and dead_lettered(broker))
+
+        assert handled == ["b1"]
+        assert len(dead_lettered(broker)) == 1
+        await subscriber.close()
+
+    asyncio.run(run())
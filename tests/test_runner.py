@@ -0,0 +1,16 @@
+import pytest
+
+from app.utils.runner import SHUTDOWN_MARGIN, ConsumerRunner
+from conftest import RecordingLogger
+
+
+async def setup(subscriber):
+    pass
+
+
+def test_shutdown_timeout_outlasts_the_drain_timeout():
+    runner = ConsumerRunner(setup, {"drain_timeout": 45.0}, audit_logger=RecordingLogger())
+    assert runner.shutdown_timeout == 45.0 + SHUTDOWN_MARGIN
+
+    with pytest.raises(ValueError):
+        ConsumerRunner(setup, {"drain_timeout": 45.0}, audit_logger=RecordingLogger(), shutdown_timeout=45.0)
@@ -0,0 +1,64 @@
+import asyncio
+
+from app.utils.messaging import MemoryMembership, assign_shards
+from app.utils.messaging.sharding import shard_queue_names
+from conftest import wait_until
+
+
+def test_assignment_moves_only_the_leaving_members_shards():
+    shards = shard_queue_names("bids", 16)
+    members = ["a", "b", "c"]
+    owned = {member: assign_shards(shards, members, member) for member in members}
+
+    assert sorted(shard for mine in owned.values() for shard in mine) == sorted(shards)
+    for member in ("a", "b"):
+        assert set(owned[member]) <= set(assign_shards(shards, ["a", "b"], member))
+
+
+def test_members_split_shards_and_keep_per_auction_order(broker, make_subscriber):
+    async def run():
+        membership = MemoryMembership()
+        processed = []
+
+        def callback(member):
+            async def on_message(message_data, request_id):
+                await asyncio.sleep(0.001)
+                processed.append((member, message_data["auction_id"], message_data["sequence"]))
+            return on_message
+
+        first, second = make_subscriber(), make_subscriber()
+        for subscriber, member in ((first, "a"), (second, "b")):
+            await subscriber.connect()
+            await subscriber.subscribe_sharded(
+                "bids", callback(member), shards=4, membership=membership, member_id=member,
+                rebalance_interval=0.02,
+            )
+        coordinators = [subscriber.shard_coordinators["bids"] for subscriber in (first, second)]
+
+        def split() -> bool:
+            owned = [shard for coordinator in coordinators for shard in coordinator.owned]
+            return sorted(owned) == shard_queue_names("bids", 4) and all(
+                coordinator.owned for coordinator in coordinators
+            )
+
+        await wait_until(broker, split)
+
+        for sequence in range(200):
+            auction_id = str(sequence % 10)
+            await first.publisher.publish(
+                {"event": "bid_placed", "auction_id": auction_id, "sequence": sequence},
+                headers={"auction_id": auction_id},
+            )
+        await wait_until(broker, lambda: len(processed) == 200)
+
+        assert {member for member, _, _ in processed} == {"a", "b"}
+        for auction_id in map(str, range(10)):
+            assert [sequence for _, key, sequence in processed if key == auction_id] == \
+                list(range(int(auction_id), 200, 10))
+
+        # The leaving member's shards go back to the one that stays.
+        await second.close()
+        await wait_until(broker, lambda: len(coordinators[0].owned) == 4)
+        await first.close()
+
+    asyncio.run(run())
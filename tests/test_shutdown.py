@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from conftest import dead_lettered
+
+SUBSCRIBE_MODES = ["subscribe_events", "subscribe_ordered"]
+
+
+async def _subscribe_slow(broker, subscriber, mode, messages, handler_seconds):
+    started = []
+
+    async def callback(message_data, request_id):
+        started.append(request_id)
+        await asyncio.sleep(handler_seconds)
+
+    await getattr(subscriber, mode)("bids", callback)
+    for i in range(messages):
+        await subscriber.publisher.publish(
+            {"event": "bid_placed", "auction_id": f"auction-{i}"},
+            headers={"request_id": f"r{i}", "auction_id": f"auction-{i}"},
+        )
+    # Not wait_until: settling the broker would wait for the callbacks to finish.
+    # Ordered lanes may hold some deliveries back, so only wait for a start.
+    while not started:
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.02)
+    return started
+
+
+@pytest.mark.parametrize("mode", SUBSCRIBE_MODES)
+def test_drain_timeout_requeues_unfinished_deliveries(broker, make_subscriber, mode):
+    async def run():
+        subscriber = make_subscriber(drain_timeout=0.05)
+        await subscriber.connect()
+        await _subscribe_slow(broker, subscriber, mode, messages=5, handler_seconds=0.5)
+
+        await subscriber.close()
+
+        assert dead_lettered(broker) == []
+        assert broker.queues["bids"].message_count == 5
+        assert all(redelivered for _, redelivered in broker.queues["bids"].ready)
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("mode", SUBSCRIBE_MODES)
+def test_close_without_drain_requeues_in_flight_deliveries(broker, make_subscriber, mode):
+    async def run():
+        subscriber = make_subscriber()
+        await subscriber.connect()
+        await _subscribe_slow(broker, subscriber, mode, messages=5, handler_seconds=0.5)
+
+        await subscriber.close(drain=False)
+
+        assert dead_lettered(broker) == []
+        assert broker.queues["bids"].message_count == 5
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("mode", SUBSCRIBE_MODES)
+def test_drain_lets_in_flight_callbacks_finish(broker, make_subscriber, mode):
+    async def run():
+        subscriber = make_subscriber()
+        await subscriber.connect()
+        await _subscribe_slow(broker, subscriber, mode, messages=5, handler_seconds=0.05)
+
+        assert await subscriber.drain(timeout=2.0)
+        await subscriber.close(drain=False)
+
+        assert dead_lettered(broker) == []
+        assert broker.queues["bids"].message_count == 0
+        assert subscriber.get_metrics()["bids"]["processed"] == 5
+
+    asyncio.run(run())
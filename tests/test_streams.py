@@ -0,0 +1,66 @@
+import asyncio
+
+from app.utils.messaging import MemoryOffsetStore
+from conftest import dead_lettered, wait_until
+
+
+async def publish(subscriber, *request_ids):
+    for request_id in request_ids:
+        await subscriber.publisher.publish({"event": "bid_placed"}, headers={"request_id": request_id})
+
+
+def test_stored_offset_resumes_after_the_committed_offset(broker, make_subscriber):
+    async def run():
+        store = MemoryOffsetStore()
+        received = []
+
+        async def callback(message_data, request_id):
+            received.append(request_id)
+
+        first = make_subscriber()
+        await first.connect()
+        await first.subscribe_stream("history", callback, offset="stored", offset_store=store,
+                                     consumer_name="projector", commit_every=1)
+        await publish(first, "r1", "r2", "r3")
+        await wait_until(broker, lambda: len(received) == 3)
+        await first.close()
+
+        second = make_subscriber()
+        await second.connect()
+        await publish(second, "r4", "r5")
+        await second.subscribe_stream("history", callback, offset="stored", offset_store=store,
+                                      consumer_name="projector", commit_every=1)
+        await wait_until(broker, lambda: len(received) == 5)
+        await asyncio.sleep(0.02)
+        await broker.settle()
+
+        assert received == ["r1", "r2", "r3", "r4", "r5"]
+        assert await store.load("projector") == 4
+        await second.close()
+
+    asyncio.run(run())
+
+
+def test_failed_stream_message_is_dead_lettered_not_retried(broker, make_subscriber):
+    async def run():
+        subscriber = make_subscriber()
+        await subscriber.connect()
+        calls = []
+
+        async def callback(message_data, request_id):
+            calls.append(request_id)
+            if request_id == "r2":
+                raise ConnectionError("projection store unavailable")
+
+        await subscriber.subscribe_stream("history", callback, offset="first")
+        await publish(subscriber, "r1", "r2", "r3")
+        await wait_until(broker, lambda: len(calls) == 3 and dead_lettered(broker))
+        await asyncio.sleep(0.02)
+        await broker.settle()
+
+        assert calls == ["r1", "r2", "r3"]
+        assert [envelope.headers["request_id"] for envelope in dead_lettered(broker)] == ["r2"]
+        assert subscriber.stream_offsets["history"].last_offset == 2
+        await subscriber.close()
+
+    asyncio.run(run())
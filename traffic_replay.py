@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import importlib
+import json
+
+from app.utils.messaging import TrafficReplayer
+
+
+def _load_callback(path: str):
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured EventSubscriber traffic to callbacks.")
+    parser.add_argument("capture", help="JSONL file written with EventSubscriber(capture_path=...)")
+    parser.add_argument(
+        "--callback", action="append", required=True, metavar="QUEUE=module:function",
+        help="callback per queue; use *=module:function for all queues",
+    )
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="0 replays as fast as possible, 1.0 at the original pacing")
+    args = parser.parse_args()
+
+    callbacks = {}
+    for spec in args.callback:
+        queue_name, _, path = spec.partition("=")
+        callbacks[queue_name] = _load_callback(path)
+
+    summary = asyncio.run(TrafficReplayer(callbacks, speed=args.speed).replay(args.capture))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()